@@ -0,0 +1,91 @@
+"""Måler sammenligningen av faktura mot tilbud for økende antall rader.
+
+Kjør fra roten av repoet::
+
+    python benchmarks/bench_compare.py --sizes 10000 100000 1000000 3000000
+
+Skriver tid og rader per sekund for hver størrelse. Er sammenligningen lineær, holder
+rader per sekund seg omtrent konstant når antall rader øker.
+
+Noen varenumre står på to linjer i tilbudet (``--doble``). Skriptet sjekker at
+sammenligningen likevel gir nøyaktig én rad per fakturalinje, pluss én per varenummer som
+bare finnes i tilbudet.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sjekkfaktura.compare import compare_invoice_to_offer  # noqa: E402
+
+
+def synthetic_frames(rows, seed=0, duplicates=0.0):
+    """Lager et tilbud og en faktura med ``rows`` varenumre hver, der de fleste overlapper.
+
+    Andelen ``duplicates`` av tilbudslinjene legges inn en gang til, som når samme vare står
+    på flere linjer i tilbudet.
+    """
+    rng = np.random.default_rng(seed)
+    offer_numbers = np.arange(1_000_000, 1_000_000 + rows)
+    # 90 % av fakturalinjene finnes i tilbudet, resten bare i fakturaen
+    invoice_numbers = np.where(rng.random(rows) < 0.9, offer_numbers, offer_numbers + rows)
+
+    offer_data = pd.DataFrame({
+        "Varenummer": offer_numbers,
+        "Beskrivelse_Tilbud": "Rør",
+        "Antall_Tilbud": rng.integers(1, 100, rows).astype("float64"),
+        "Enhet_Tilbud": "STK",
+        "Enhetspris_Tilbud": rng.integers(10, 5000, rows).astype("float64"),
+    })
+    unit_price = offer_data["Enhetspris_Tilbud"] * rng.choice([1.0, 1.0, 1.0, 1.05], rows)
+    invoice_data = pd.DataFrame({
+        "UnikID": "123456_" + pd.Series(invoice_numbers).astype(str),
+        "Varenummer": pd.Series(invoice_numbers).astype(str),
+        "Beskrivelse_Faktura": "Rør",
+        "Antall_Faktura": offer_data["Antall_Tilbud"] * rng.choice([1.0, 1.0, 0.5], rows),
+        # Noen linjer har enhetsprisen i rabattkolonnen, slik tolkeren av og til gir
+        "Enhetspris_Faktura": unit_price.mask(rng.random(rows) < 0.05),
+        "Rabatt": 0.0,
+        "Beløp_Faktura": unit_price * offer_data["Antall_Tilbud"],
+        "Type": "Faktura",
+    })
+    invoice_data["Rabatt"] = invoice_data["Rabatt"].mask(invoice_data["Enhetspris_Faktura"].isna(), unit_price)
+    extra = offer_data[rng.random(rows) < duplicates]
+    return invoice_data, pd.concat([offer_data, extra], ignore_index=True)
+
+
+def expected_rows(invoice_data, offer_data):
+    """Én rad per fakturalinje og én per varenummer som bare finnes i tilbudet."""
+    offer_numbers = set(offer_data["Varenummer"].astype(str))
+    return len(invoice_data) + len(offer_numbers - set(invoice_data["Varenummer"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3, help="beste av N kjøringer")
+    parser.add_argument("--doble", type=float, default=0.02, help="andel tilbudslinjer med et varenummer som står to ganger")
+    args = parser.parse_args(argv)
+
+    print(f"{'rader':>12} {'samlet':>12} {'sekunder':>10} {'rader/s':>14}")
+    for size in args.sizes:
+        invoice_data, offer_data = synthetic_frames(size, duplicates=args.doble)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = compare_invoice_to_offer(invoice_data, offer_data)
+            best = min(best, time.perf_counter() - start)
+        merged_rows = len(result["samlet"])
+        if merged_rows != expected_rows(invoice_data, offer_data):
+            sys.exit(f"Feil antall rader for {size:,}: {merged_rows:,}, ventet {expected_rows(invoice_data, offer_data):,}")
+        print(f"{size:>12,} {merged_rows:>12,} {best:>10.3f} {merged_rows / best:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Måler kolonnetolkeren for artikkellinjer mot den opprinnelige radvise tolkeren.
+
+Kjør fra roten av repoet::
+
+    python benchmarks/bench_lineparser.py --lines 200000
+
+Måler linjer per sekund for begge på et syntetisk utvalg linjer laget med
+``benchmarks/synthetic.py``. At de to gir de samme radene, sjekkes i
+``tests/test_lineparser.py``, som også har den radvise tolkeren.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import invoice_lines, norwegian, offer_lines  # noqa: E402
+from tests.test_lineparser import columnar_rows, reference_rows  # noqa: E402
+
+
+def synthetic_lines(count, seed=0):
+    offer = offer_lines(1000, seed)
+    return [
+        f"{number} {article} {description} {quantity} {norwegian(unit_price)} {norwegian(discount)} {norwegian(amount)}"
+        for number, (article, description, quantity, unit_price, discount, amount) in enumerate(invoice_lines(offer, count, seed), start=1)
+    ]
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000, help="antall syntetiske linjer")
+    parser.add_argument("--repeat", type=int, default=3, help="beste av N kjøringer")
+    args = parser.parse_args(argv)
+
+    # Linjer med tall som ikke kan konverteres, gir advarsler; de hører ikke hjemme her
+    logging.disable(logging.WARNING)
+
+    lines = synthetic_lines(args.lines)
+    reference = best_of(lambda: reference_rows(lines, "Faktura", "90000001"), args.repeat)
+    columnar = best_of(lambda: columnar_rows(lines, "Faktura", "90000001").unique_ids(), args.repeat)
+    print(f"{'tolker':<12} {'sekunder':>10} {'linjer per sekund':>20}")
+    print(f"{'radvis':<12} {reference:>10.3f} {len(lines) / reference:>20,.0f}")
+    print(f"{'kolonnevis':<12} {columnar:>10.3f} {len(lines) / columnar:>20,.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
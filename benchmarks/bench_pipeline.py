@@ -0,0 +1,145 @@
+"""Måler hvert steg i fakturasjekken på syntetiske fakturaer og tilbud.
+
+Kjør fra roten av repoet::
+
+    python benchmarks/bench_pipeline.py --pages 80 --invoices 4 --offer-rows 100000
+
+Stegene er PDF-tolking (per motor), innlesing av tilbud (per Excel-motor), import og
+oppslag i tilbudskatalogen, sammenligning og eksport (per format). For hvert steg skrives
+tid, gjennomstrømning og største minnebruk (tracemalloc, bare Python-allokeringer).
+Tolkingen sjekkes også for paritet: alle PDF-motorene skal gi de samme radene.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from benchmarks.synthetic import generate  # noqa: E402
+from sjekkfaktura.catalog import OfferCatalog  # noqa: E402
+from sjekkfaktura.compare import compare_invoice_to_offer  # noqa: E402
+from sjekkfaktura.export import EXPORT_FORMATS, write_report  # noqa: E402
+from sjekkfaktura.offer import available_offer_engines, read_offer  # noqa: E402
+from sjekkfaktura.parser import extract_data_from_pdf  # noqa: E402
+from sjekkfaktura.pdf_backends import available_backends, get_backend  # noqa: E402
+
+
+def measure(name, func, units, unit_name, repeat=1):
+    """Kjører ``func`` ``repeat`` ganger og returnerer resultatet og målingen for beste kjøring."""
+    best = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if best is None or seconds < best["sekunder"]:
+            best = {"steg": name, "sekunder": seconds, "enheter": units(result) if callable(units) else units, "enhet": unit_name, "topp_mb": peak / 1e6}
+    best["per_sekund"] = best["enheter"] / best["sekunder"] if best["sekunder"] > 0 else float("inf")
+    return result, best
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="sjekkfaktura-bench-")
+    pdf_paths, offer_path = generate(workdir, args.invoices, args.pages, args.lines_per_page, args.offer_rows, args.seed, args.terms_pages)
+    pages = sum(get_backend().page_count(path) for path in pdf_paths)
+    measurements = []
+
+    # PDF-tolking med hver motor, og paritet mellom dem
+    parsed = {}
+    for backend in available_backends():
+        frames, m = measure(
+            f"tolking ({backend})",
+            lambda: [extract_data_from_pdf(path, backend=backend) for path in pdf_paths],
+            pages,
+            "sider",
+            args.repeat,
+        )
+        m["linjer"] = sum(len(frame) for frame in frames)
+        measurements.append(m)
+        parsed[backend] = pd.concat(frames, ignore_index=True)
+
+    reference_backend, invoice_data = next(iter(parsed.items()))
+    parity = {
+        backend: frame.reset_index(drop=True).equals(invoice_data.reset_index(drop=True))
+        for backend, frame in parsed.items()
+    }
+
+    # Innlesing av tilbudet med hver Excel-motor
+    for engine in available_offer_engines():
+        _, m = measure(f"tilbud ({engine})", lambda: read_offer(offer_path, engine), len, "rader", args.repeat)
+        measurements.append(m)
+
+    # Import til katalogen og oppslag av varenumrene på fakturaene
+    with open(offer_path, "rb") as f:
+        offer_bytes = f.read()
+    catalog = OfferCatalog(os.path.join(workdir, "katalog.sqlite"))
+    offer_hash, m = measure("katalog import", lambda: catalog.import_offer(offer_bytes, "syntetisk"), args.offer_rows, "rader")
+    measurements.append(m)
+    offer_data, m = measure("katalog oppslag", lambda: catalog.offer_for_invoice(offer_hash, invoice_data), len, "rader", args.repeat)
+    measurements.append(m)
+
+    result, m = measure("sammenligning", lambda: compare_invoice_to_offer(invoice_data, offer_data), lambda r: len(r["samlet"]), "rader", args.repeat)
+    measurements.append(m)
+
+    report_rows = len(result["avvik"]) + len(result["kun_i_faktura"])
+    for fmt in EXPORT_FORMATS:
+        target = os.path.join(workdir, f"rapport.{fmt}")
+        _, m = measure(f"eksport ({fmt})", lambda: write_report(result, target, fmt), report_rows, "rader", args.repeat)
+        measurements.append(m)
+
+    return {
+        "oppsett": {
+            "fakturaer": args.invoices,
+            "sider": pages,
+            "betingelsessider": args.terms_pages,
+            "linjer_per_side": args.lines_per_page,
+            "tilbudsrader": args.offer_rows,
+            "mappe": workdir,
+        },
+        "paritet": {"referanse": reference_backend, "lik": parity},
+        "steg": measurements,
+    }
+
+
+def print_report(report):
+    setup = report["oppsett"]
+    print(f"{setup['fakturaer']} faktura(er), {setup['sider']} sider, {setup['linjer_per_side']} linjer per side, {setup['tilbudsrader']:,} tilbudsrader")
+    print(f"{'steg':<32} {'sekunder':>10} {'per sekund':>16} {'topp MB':>10}")
+    for m in report["steg"]:
+        print(f"{m['steg']:<32} {m['sekunder']:>10.3f} {m['per_sekund']:>12,.0f} {m['enhet']:<4}{m['topp_mb']:>9.1f}")
+    for backend, equal in report["paritet"]["lik"].items():
+        print(f"paritet {backend} mot {report['paritet']['referanse']}: {'OK' if equal else 'AVVIK'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--invoices", type=int, default=1, help="antall fakturaer")
+    parser.add_argument("--pages", type=int, default=20, help="sider med artikkellinjer per faktura")
+    parser.add_argument("--terms-pages", type=int, default=2, help="sider med betingelser til slutt i hver faktura")
+    parser.add_argument("--lines-per-page", type=int, default=40)
+    parser.add_argument("--offer-rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=1, help="beste av N kjøringer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="mappe for genererte filer (standard: en midlertidig mappe)")
+    parser.add_argument("--json", action="store_true", help="skriv resultatet som JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+    return 0 if all(report["paritet"]["lik"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
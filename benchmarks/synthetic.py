@@ -0,0 +1,155 @@
+"""Generator for syntetiske fakturaer og tilbud fra Brødrene Dahl.
+
+Fakturaene lages med PyMuPDF og har samme oppsett som tolkeren i
+``sjekkfaktura.parser`` forventer: en «Fakturanummer»-linje i hodet, en
+«Artikkel»-overskrift og deretter artikkellinjer med løpenummer, varenummer,
+beskrivelse, antall, enhetspris, rabatt og beløp. Tilbudene skrives som .xlsx med
+``VARENR``/``BESKRIVELSE``/``ANTALL``/``ENHET``/``ENHETSPRIS``/``TOTALPRIS`` under et
+par tittelrader, slik tilbudene fra Brødrene Dahl ser ut. Fakturaene kan få sider med
+salgs- og leveringsbetingelser til slutt, som ikke skal gi artikkellinjer.
+"""
+
+import os
+import random
+
+# Ingen beskrivelse slutter på et tall, ellers tolkes tallet som antall
+DESCRIPTIONS = [
+    "Rør PP grå 110mm",
+    "Bend PP 45gr 110mm",
+    "Grenrør PP 110x110mm",
+    "Kobberrør hardt 15mm",
+    "Pressmuffe kobber 22mm",
+    "Kuleventil DN20 messing",
+    "Isolasjon rørskål",
+    "Rørklammer M8 galv",
+    "Gulvsluk plast",
+    "Koblingsboks rør-i-rør",
+]
+UNITS = ["STK", "M", "PAK", "RL"]
+
+TERMS = [
+    "Betaling skal skje innen forfallsdato. Ved forsinket betaling beregnes forsinkelsesrente.",
+    "Reklamasjon må meldes skriftlig straks feil eller mangler oppdages, og senest innen fem virkedager.",
+    "Varene forblir selgers eiendom til kjøpesummen med tillegg av renter og omkostninger er betalt.",
+    "Retur av varer skal avtales på forhånd. Spesialbestilte varer tas ikke i retur.",
+]
+
+FIRST_ARTICLE = 1_000_000
+
+
+def norwegian(value, decimals=2):
+    """Formaterer et tall som «1.234,50»."""
+    text = f"{value:,.{decimals}f}"
+    return text.replace(",", " ").replace(".", ",").replace(" ", ".")
+
+
+def offer_lines(rows, seed=0):
+    """Tilbudslinjer som ``(varenr, beskrivelse, antall, enhet, enhetspris)``."""
+    rng = random.Random(seed)
+    return [
+        (
+            FIRST_ARTICLE + index,
+            rng.choice(DESCRIPTIONS),
+            rng.randint(1, 200),
+            rng.choice(UNITS),
+            round(rng.uniform(5, 5000), 2),
+        )
+        for index in range(rows)
+    ]
+
+
+def invoice_lines(offer, count, seed=0, deviation_rate=0.1, unknown_rate=0.05):
+    """Fakturalinjer som ``(varenr, beskrivelse, antall, enhetspris, rabatt, beløp)``.
+
+    De fleste linjene er hentet fra tilbudet; en andel har avvik i pris eller antall, og
+    en andel har varenumre som ikke finnes i tilbudet.
+    """
+    rng = random.Random(seed + 1)
+    lines = []
+    for _ in range(count):
+        if rng.random() < unknown_rate:
+            article, description, quantity, unit_price = FIRST_ARTICLE + len(offer) + rng.randint(0, 99_999), rng.choice(DESCRIPTIONS), rng.randint(1, 50), round(rng.uniform(5, 500), 2)
+        else:
+            article, description, quantity, _, unit_price = rng.choice(offer)
+        if rng.random() < deviation_rate:
+            unit_price = round(unit_price * rng.choice([1.05, 1.1, 0.95]), 2)
+        discount = rng.choice([0, 0, 10, 25])
+        amount = round(quantity * unit_price * (1 - discount / 100), 2)
+        lines.append((article, description, quantity, unit_price, discount, amount))
+    return lines
+
+
+def write_offer_xlsx(path, offer):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    sheet = workbook.add_worksheet("Tilbud")
+    sheet.write_row(0, 0, ["Tilbud fra Brødrene Dahl"])
+    sheet.write_row(1, 0, ["Prosjekt: Syntetisk"])
+    sheet.write_row(3, 0, ["VARENR", "BESKRIVELSE", "ANTALL", "ENHET", "ENHETSPRIS", "TOTALPRIS"])
+    for row, (article, description, quantity, unit, unit_price) in enumerate(offer, start=4):
+        sheet.write_row(row, 0, [article, description, quantity, unit, unit_price, round(quantity * unit_price, 2)])
+    workbook.close()
+
+
+def write_invoice_pdf(path, lines, invoice_number, lines_per_page=40, terms_pages=0):
+    """Skriver en faktura med ``lines_per_page`` artikkellinjer per side og ``terms_pages`` sider
+    med betingelser til slutt. Returnerer antall sider."""
+    import fitz
+
+    doc = fitz.open()
+    table_pages = max(1, -(-len(lines) // lines_per_page))
+    pages = table_pages + terms_pages
+    for page_index in range(table_pages):
+        page = doc.new_page(width=595, height=842)
+        y = 50
+        if page_index == 0:
+            for text in (
+                "Brødrene Dahl AS",
+                f"Fakturanummer: {invoice_number}",
+                "Fakturadato: 15.10.2026",
+                "Kundenummer: 123456",
+            ):
+                page.insert_text((40, y), text, fontsize=9)
+                y += 14
+            y += 10
+        page.insert_text((40, y), "Linje Artikkel Beskrivelse Antall Enhetspris Rabatt Beløp", fontsize=9)
+        y += 16
+        # Tettere linjer når mange linjer skal få plass på én side
+        spacing = min(17, (800 - y) / lines_per_page)
+        chunk = lines[page_index * lines_per_page:(page_index + 1) * lines_per_page]
+        for number, (article, description, quantity, unit_price, discount, amount) in enumerate(chunk, start=page_index * lines_per_page + 1):
+            text = f"{number} {article} {description} {quantity} {norwegian(unit_price)} {norwegian(discount)} {norwegian(amount)}"
+            page.insert_text((40, y), text, fontsize=8)
+            y += spacing
+        page.insert_text((40, 820), f"Side {page_index + 1} av {pages}", fontsize=8)
+    for page_index in range(table_pages, pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((40, 50), "Salgs- og leveringsbetingelser", fontsize=11)
+        y = 80
+        for paragraph in range(60):
+            page.insert_text((40, y), f"{paragraph + 1}. {TERMS[paragraph % len(TERMS)]}", fontsize=7)
+            y += 12
+        page.insert_text((40, 820), f"Side {page_index + 1} av {pages}", fontsize=8)
+    doc.save(path)
+    doc.close()
+    return pages
+
+
+def generate(directory, invoices=1, pages=10, lines_per_page=40, offer_rows=10_000, seed=0, terms_pages=0):
+    """Lager ``invoices`` fakturaer og ett tilbud i ``directory``. Returnerer ``(pdf-stier, tilbudssti)``.
+
+    ``pages`` er antall sider med artikkellinjer; ``terms_pages`` sider med betingelser kommer i tillegg.
+    """
+    os.makedirs(directory, exist_ok=True)
+    offer = offer_lines(offer_rows, seed)
+    offer_path = os.path.join(directory, f"tilbud_{offer_rows}.xlsx")
+    write_offer_xlsx(offer_path, offer)
+
+    pdf_paths = []
+    for index in range(invoices):
+        lines = invoice_lines(offer, pages * lines_per_page, seed + index)
+        path = os.path.join(directory, f"faktura_{index + 1}_{pages}s.pdf")
+        write_invoice_pdf(path, lines, 90_000_000 + index, lines_per_page, terms_pages)
+        pdf_paths.append(path)
+    return pdf_paths, offer_path
@@ -0,0 +1,19 @@
+"""Kjernelogikk for å sjekke fakturaer fra Brødrene Dahl mot tilbud.
+
+Modulene importerer ikke Streamlit, så de kan brukes fra kommandolinjen
+(``python -m sjekkfaktura``), i nattlige jobber og fra ``streamlit_app.py``.
+"""
+
+from .compare import compare_invoice_to_offer
+from .offer import OFFER_COLUMNS, normalize_offer, read_offer
+from .parser import extract_data_from_pdf, get_invoice_number, parse_invoice
+
+__all__ = [
+    "OFFER_COLUMNS",
+    "compare_invoice_to_offer",
+    "extract_data_from_pdf",
+    "get_invoice_number",
+    "normalize_offer",
+    "parse_invoice",
+    "read_offer",
+]
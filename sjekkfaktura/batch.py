@@ -0,0 +1,154 @@
+"""Parallell tolking av mange fakturaer i en prosesspool.
+
+Hver faktura tolkes i sin helhet av én prosess. Svært lange fakturaer deles i
+sideutvalg som tolkes hver for seg og slås sammen igjen i siderekkefølge, slik at
+radene blir de samme som ved en vanlig gjennomgang.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from .parser import combine_page_ranges, parse_page_range
+from .pdf_backends import get_backend, read_bytes
+
+# Fakturaer med flere sider enn dette deles mellom flere prosesser
+PAGES_PER_CHUNK = 20
+
+
+def _page_chunks(page_count, pages_per_chunk):
+    if page_count <= pages_per_chunk:
+        return [None]
+    return [
+        range(start, min(start + pages_per_chunk, page_count + 1))
+        for start in range(1, page_count + 1, pages_per_chunk)
+    ]
+
+
+def file_result(name, chunks, error=None):
+    """Setter sammen sideutvalgene for én fil til ``{"navn", "header", "data", "feil", "sidetider"}``."""
+    if error is not None:
+        return {"navn": name, "header": {}, "data": pd.DataFrame(), "feil": error, "sidetider": []}
+
+    header, rows = combine_page_ranges(chunks)
+    data = rows.to_frame()
+    page_times = [page_time for chunk in chunks for page_time in chunk["sidetider"]]
+    if "Fakturanummer" not in header:
+        error = "Fakturanummeret ble ikke funnet i PDF-filen."
+    elif data.empty:
+        error = "Ingen data ble funnet i PDF-filen."
+    return {"navn": name, "header": header, "data": data, "feil": error, "sidetider": page_times}
+
+
+def plan_files(files, backend=None, pages_per_chunk=PAGES_PER_CHUNK):
+    """Leser filene og deler dem i sideutvalg.
+
+    ``files`` er en liste med ``(navn, kilde)`` der kilden er en sti, bytes eller et
+    filobjekt. Returnerer én plan per fil i samme rekkefølge, ``{"navn", "data",
+    "antall_sider", "utvalg", "feil"}``, der ``utvalg`` er sideutvalgene (None betyr hele
+    filen) og ``feil`` er en feilmelding hvis filen ikke kunne åpnes.
+    """
+    backend = get_backend(backend)
+    plans = []
+    for name, source in files:
+        data = read_bytes(source)
+        try:
+            page_count = backend.page_count(data)
+        except Exception as e:
+            plans.append({"navn": name, "data": None, "antall_sider": 0, "utvalg": [], "feil": f"Kunne ikke lese PDF: {e}"})
+            continue
+        plans.append({"navn": name, "data": data, "antall_sider": page_count, "utvalg": _page_chunks(page_count, pages_per_chunk), "feil": None})
+    return plans
+
+
+def iter_page_ranges(plans, backend=None, max_workers=None):
+    """Tolker sideutvalgene i ``plans`` og gir fra seg ``(fil, utvalg, resultat, feil)`` etter
+    hvert som de blir ferdige.
+
+    ``fil`` er indeksen i ``plans``, ``utvalg`` er indeksen til sideutvalget og ``resultat`` er
+    fra :func:`~sjekkfaktura.parser.parse_page_range`. Feiler et utvalg, gis unntaket i ``feil``
+    én gang og resten av filen hoppes over. Avsluttes gjennomgangen før den er ferdig (f.eks.
+    fordi brukeren avbryter), startes ingen flere utvalg.
+    """
+    backend = get_backend(backend).name
+    jobs = [
+        (key, index, plan["data"], pages)
+        for key, plan in enumerate(plans) if plan["feil"] is None
+        for index, pages in enumerate(plan["utvalg"])
+    ]
+    failed = set()
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(jobs) <= 1:
+        for key, index, data, pages in jobs:
+            if key in failed:
+                continue
+            try:
+                chunk = parse_page_range(data, pages, backend=backend)
+            except Exception as e:
+                failed.add(key)
+                yield key, index, None, e
+                continue
+            yield key, index, chunk, None
+        return
+
+    # Streamlit-serveren kjører flere tråder, så vi starter nye prosesser i stedet for å forke
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=min(max_workers, len(jobs)), mp_context=context)
+    try:
+        futures = {
+            executor.submit(parse_page_range, data, pages, backend=backend): (key, index)
+            for key, index, data, pages in jobs
+        }
+        for future in as_completed(futures):
+            key, index = futures[future]
+            if key in failed:
+                continue
+            try:
+                chunk = future.result()
+            except Exception as e:
+                failed.add(key)
+                yield key, index, None, e
+                continue
+            yield key, index, chunk, None
+    finally:
+        # Utvalg som ikke er startet ennå, droppes; de som kjører, får gjøre seg ferdige
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_invoices(files, backend=None, max_workers=None, pages_per_chunk=PAGES_PER_CHUNK):
+    """Tolker mange fakturaer og gir fra seg ett resultat per fil etter hvert som de blir ferdige.
+
+    ``files`` er en liste med ``(navn, kilde)`` der kilden er en sti, bytes eller et
+    filobjekt. Hvert resultat er ``{"navn", "header", "data", "feil", "sidetider"}``; ``feil``
+    er None når filen ble tolket og ellers en feilmelding, og da er ``data`` tom.
+    ``sidetider`` er uttrekkstiden per side, ``[(sidenummer, sekunder), ...]``.
+    """
+    backend = get_backend(backend).name
+    plans = plan_files(files, backend, pages_per_chunk)
+    pending = {}
+    for key, plan in enumerate(plans):
+        if plan["feil"] is not None:
+            yield file_result(plan["navn"], None, plan["feil"])
+        else:
+            pending[key] = [None] * len(plan["utvalg"])
+
+    for key, index, chunk, error in iter_page_ranges(plans, backend, max_workers):
+        if error is not None:
+            del pending[key]
+            yield file_result(plans[key]["navn"], None, f"Kunne ikke lese data fra PDF: {error}")
+            continue
+        # Gir et ferdig resultat når alle sideutvalgene for filen er tolket
+        pending[key][index] = chunk
+        if all(c is not None for c in pending[key]):
+            yield file_result(plans[key]["navn"], pending.pop(key))
+
+
+def combine_invoice_data(results):
+    """Slår sammen radene fra alle fakturaer som ble tolket uten feil."""
+    frames = [result["data"] for result in results if result["feil"] is None and not result["data"].empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,217 @@
+"""Innholdsadressert hurtigbuffer for tolkede fakturaer og normaliserte tilbud.
+
+Nøkkelen er SHA-256 av de opplastede bytene (pluss et navnerom som sier hva som er
+lagret), så samme fil gir treff uansett filnavn. Bufferen har to lag:
+
+* et lag i prosessen (LRU etter antall oppføringer) som overlever Streamlit-reruns
+* et lag på disk med én Parquet-fil per oppføring og LRU-utkasting etter samlet størrelse
+
+Metadata (f.eks. fakturahodet) lagres sammen med tabellen i Parquet-skjemaet. Kolonner med
+blandede typer, som ``Antall_Faktura`` med både tall og tekst som «-2» fra kreditlinjer, kan
+ikke lagres i Parquet som de er. Hver verdi i slike kolonner lagres derfor som JSON og
+gjøres om igjen ved lesing, så tall forblir tall og tekst forblir tekst.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SJEKKFAKTURA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sjekkfaktura")
+)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MEMORY_ENTRIES = 32
+
+# Økes når tolkeren endres slik at gamle oppføringer ikke lenger er gyldige
+CACHE_VERSION = 3
+
+_META_KEY = b"sjekkfaktura"
+# Kolonnene som er lagret som JSON, se _encode_mixed()
+_JSON_COLUMNS_KEY = b"sjekkfaktura_json"
+
+
+def cache_key(data, namespace):
+    """Lager en nøkkel av innholdet i en fil og et navnerom, f.eks. ``faktura-pymupdf``."""
+    return f"{namespace}-v{CACHE_VERSION}-{hashlib.sha256(data).hexdigest()}"
+
+
+def _json_default(value):
+    # Tall fra numpy, f.eks. numpy.int64, er ikke vanlige Python-tall
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} kan ikke lagres som JSON")
+
+
+def _encode_mixed(df):
+    """Gjør om objektkolonner med blandede typer til JSON-tekst. Returnerer ``(df, kolonner)``."""
+    from pandas.api.types import infer_dtype
+
+    columns = [
+        column for column in df.columns
+        if df[column].dtype == object and infer_dtype(df[column], skipna=False) in ("mixed", "mixed-integer")
+    ]
+    if not columns:
+        return df, columns
+    df = df.copy()
+    for column in columns:
+        df[column] = [json.dumps(value, default=_json_default) for value in df[column]]
+    return df, columns
+
+
+def _decode_mixed(df, columns):
+    """Gjør om kolonnene fra :func:`_encode_mixed` tilbake til verdiene de hadde."""
+    import pandas as pd
+
+    for column in columns:
+        df[column] = pd.Series([json.loads(value) for value in df[column]], index=df.index, dtype="object")
+    return df
+
+
+class DataFrameCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"minne_treff": 0, "disk_treff": 0, "bom": 0}
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returnerer ``(df, meta)`` eller None. Treff på disk løftes opp i minnelaget."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.stats["minne_treff"] += 1
+                return value[0].copy(), dict(value[1])
+
+        value = self._read_disk(key)
+        if value is None:
+            with self._lock:
+                self.stats["bom"] += 1
+            return None
+
+        with self._lock:
+            self.stats["disk_treff"] += 1
+        self._remember(key, value)
+        return value[0].copy(), dict(value[1])
+
+    def put(self, key, df, meta=None):
+        value = (df.copy(), dict(meta or {}))
+        self._remember(key, value)
+        self._write_disk(key, *value)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for key in self.stats:
+                self.stats[key] = 0
+        for path in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def disk_usage(self):
+        return sum(os.path.getsize(path) for path in self._disk_entries())
+
+    def _disk_entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".parquet")
+        ]
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            import pyarrow.parquet as pq
+
+            table = pq.read_table(path)
+            metadata = table.schema.metadata or {}
+            meta = json.loads(metadata.get(_META_KEY, b"{}"))
+            df = _decode_mixed(table.to_pandas(), json.loads(metadata.get(_JSON_COLUMNS_KEY, b"[]")))
+            # Oppdater tidsstempelet slik at filen regnes som nylig brukt ved utkasting
+            os.utime(path)
+            return df, meta
+        except (ImportError, OSError, ValueError) as e:
+            logger.warning("Kunne ikke lese %s fra hurtigbufferen: %s", path, e)
+            return None
+
+    def _write_disk(self, key, df, meta):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            df, json_columns = _encode_mixed(df)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[_META_KEY] = json.dumps(meta).encode("utf-8")
+            metadata[_JSON_COLUMNS_KEY] = json.dumps(json_columns).encode("utf-8")
+            table = table.replace_schema_metadata(metadata)
+
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            os.close(fd)
+            try:
+                pq.write_table(table, tmp_path)
+                os.replace(tmp_path, self._path(key))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        except (ImportError, OSError, TypeError, ValueError) as e:
+            # Verdier som verken Parquet eller JSON kan lagre; da holder minnelaget
+            logger.warning("Kunne ikke lagre %s på disk: %s", key, e)
+            return
+
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for path in self._disk_entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Felles buffer for prosessen, slik at den overlever Streamlit-reruns."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DataFrameCache()
+    return _default_cache
@@ -0,0 +1,161 @@
+"""Lokal tilbudskatalog i SQLite.
+
+Et tilbud importeres én gang og lagres som en versjon identifisert av SHA-256 av
+Excel-filen. Linjene er indeksert på ``(tilbud, varenummer)``, så en sammenligning
+henter bare varenumrene som faktisk står på fakturaen i stedet for å lese og slå
+sammen hele tilbudet hver gang.
+"""
+
+import hashlib
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+
+from .compare import normalize_article_numbers
+from .offer import OFFER_COLUMNS, read_offer
+
+DEFAULT_CATALOG_PATH = os.environ.get(
+    "SJEKKFAKTURA_CATALOG", os.path.join(os.path.expanduser("~"), ".local", "share", "sjekkfaktura", "tilbud.sqlite")
+)
+
+# Kolonnene i tabellen offer_lines og hvilke tilbudskolonner de svarer til
+LINE_COLUMNS = {
+    "varenummer": "Varenummer",
+    "beskrivelse": "Beskrivelse_Tilbud",
+    "antall": "Antall_Tilbud",
+    "enhet": "Enhet_Tilbud",
+    "enhetspris": "Enhetspris_Tilbud",
+    "totalpris": "Totalt pris",
+}
+_NUMERIC = {"antall", "enhetspris", "totalpris"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS offers (
+    hash TEXT PRIMARY KEY,
+    navn TEXT NOT NULL,
+    importert TEXT NOT NULL,
+    rader INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS offer_lines (
+    offer_hash TEXT NOT NULL REFERENCES offers(hash) ON DELETE CASCADE,
+    varenummer TEXT,
+    beskrivelse TEXT,
+    antall REAL,
+    enhet TEXT,
+    enhetspris REAL,
+    totalpris REAL
+);
+CREATE INDEX IF NOT EXISTS offer_lines_varenummer ON offer_lines (offer_hash, varenummer);
+"""
+
+
+class OfferCatalog:
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        self.path = path
+        self.last_import = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as con:
+            con.executescript(_SCHEMA)
+
+    def _connect(self):
+        con = sqlite3.connect(self.path)
+        con.execute("PRAGMA foreign_keys = ON")
+        return con
+
+    def import_offer(self, data, name, engine=None):
+        """Importerer et tilbud (bytes fra en Excel-fil) og returnerer hashen.
+
+        Finnes samme fil allerede i katalogen, leses den ikke på nytt. Statistikk fra
+        innlesingen (se :func:`sjekkfaktura.offer.read_offer`) legges i ``last_import``.
+        """
+        offer_hash = hashlib.sha256(data).hexdigest()
+        if self.has_offer(offer_hash):
+            return offer_hash
+
+        offer_data = read_offer(BytesIO(data), engine)
+        self.last_import = offer_data.attrs.get("innlesing")
+        lines = pd.DataFrame(index=offer_data.index)
+        for column, offer_column in LINE_COLUMNS.items():
+            values = offer_data[offer_column] if offer_column in offer_data else pd.Series(None, index=offer_data.index, dtype="object")
+            if column == "varenummer":
+                values = normalize_article_numbers(values)
+            elif column in _NUMERIC:
+                values = pd.to_numeric(values, errors="coerce")
+            else:
+                values = values.astype("string")
+            lines[column] = values.astype("object").where(values.notna(), None)
+
+        with closing(self._connect()) as con, con:
+            con.execute(
+                "INSERT INTO offers (hash, navn, importert, rader) VALUES (?, ?, ?, ?)",
+                (offer_hash, name, datetime.now().isoformat(timespec="seconds"), len(lines)),
+            )
+            con.executemany(
+                f"INSERT INTO offer_lines (offer_hash, {', '.join(LINE_COLUMNS)}) VALUES (?{', ?' * len(LINE_COLUMNS)})",
+                ((offer_hash, *row) for row in lines.itertuples(index=False, name=None)),
+            )
+        return offer_hash
+
+    def has_offer(self, offer_hash):
+        return self.offer_info(offer_hash) is not None
+
+    def offer_info(self, offer_hash):
+        """``{"hash", "navn", "importert", "rader"}`` for et lagret tilbud, eller None."""
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT hash, navn, importert, rader FROM offers WHERE hash = ?", (offer_hash,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("hash", "navn", "importert", "rader"), row))
+
+    def list_offers(self):
+        """Alle lagrede tilbudsversjoner, nyeste først."""
+        with closing(self._connect()) as con:
+            return pd.read_sql_query("SELECT hash, navn, importert, rader FROM offers ORDER BY importert DESC", con)
+
+    def resolve(self, reference):
+        """Finner hashen til et lagret tilbud ut fra hele hashen eller starten av den."""
+        with closing(self._connect()) as con:
+            matches = [row[0] for row in con.execute("SELECT hash FROM offers WHERE hash LIKE ?", (f"{reference}%",))]
+        if len(matches) != 1:
+            raise KeyError(f"Fant {len(matches)} tilbud som passer med {reference!r}")
+        return matches[0]
+
+    def lookup(self, offer_hash, article_numbers):
+        """Henter tilbudslinjene for de oppgitte varenumrene via indeksen."""
+        article_numbers = normalize_article_numbers(pd.Series(article_numbers)).dropna().unique()
+        with closing(self._connect()) as con:
+            con.execute("CREATE TEMP TABLE wanted (varenummer TEXT PRIMARY KEY)")
+            con.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", ((str(n),) for n in article_numbers))
+            lines = pd.read_sql_query(
+                f"SELECT {', '.join('l.' + c for c in LINE_COLUMNS)} FROM offer_lines l "
+                "JOIN wanted w ON w.varenummer = l.varenummer WHERE l.offer_hash = ?",
+                con,
+                params=(offer_hash,),
+            )
+        return self._to_offer_frame(lines)
+
+    def offer_for_invoice(self, offer_hash, invoice_data):
+        """Tilbudslinjene som er relevante for en faktura, klare for sammenligning."""
+        return self.lookup(offer_hash, invoice_data["Varenummer"])
+
+    @staticmethod
+    def _to_offer_frame(lines):
+        lines = lines.rename(columns=LINE_COLUMNS)
+        lines["Varenummer"] = lines["Varenummer"].astype("string")
+        return lines[list(OFFER_COLUMNS.values())]
+
+
+_default_catalog = None
+
+
+def default_catalog():
+    global _default_catalog
+    if _default_catalog is None:
+        _default_catalog = OfferCatalog()
+    return _default_catalog
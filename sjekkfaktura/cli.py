@@ -0,0 +1,127 @@
+"""Kommandolinje for å sjekke en mappe med fakturaer mot et tilbud uten Streamlit.
+
+Eksempel::
+
+    python -m sjekkfaktura fakturaer/ tilbud.xlsx -o avvik.xlsx
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+from .batch import combine_invoice_data, parse_invoices
+from .catalog import DEFAULT_CATALOG_PATH, OfferCatalog
+from .compare import compare_invoice_to_offer
+from .export import EXPORT_FORMATS, write_report
+from .offer import OFFER_ENGINES
+from .pdf_backends import BACKENDS
+from .profiling import Profiler, enable_json_log
+
+logger = logging.getLogger("sjekkfaktura")
+
+
+def find_invoices(path):
+    """Returnerer PDF-filene i en mappe (sortert), eller filen selv hvis en fil er oppgitt."""
+    if os.path.isfile(path):
+        return [path]
+    return sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if name.lower().endswith(".pdf")
+    )
+
+
+def resolve_offer(catalog, reference, engine=None):
+    """Importerer tilbudet hvis ``reference`` er en fil, og finner det ellers i katalogen ut fra hashen.
+
+    Gir KeyError hvis ingen (eller flere) lagrede tilbud passer.
+    """
+    if not os.path.isfile(reference):
+        return catalog.resolve(reference)
+
+    catalog.last_import = None
+    with open(reference, "rb") as f:
+        offer_hash = catalog.import_offer(f.read(), os.path.basename(reference), engine)
+    if catalog.last_import:
+        stats = catalog.last_import
+        print(f"Leste {stats['rader']} tilbudsrader med {stats['motor']} på {stats['sekunder']:.2f} s ({stats['rader_per_sekund']:,.0f} rader/s)")
+    return offer_hash
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="sjekkfaktura",
+        description="Sammenlign fakturaer fra Brødrene Dahl mot et tilbud og skriv en avviksrapport.",
+    )
+    parser.add_argument("fakturaer", help="mappe med PDF-fakturaer, eller én PDF-fil")
+    parser.add_argument("tilbud", help="tilbudet som Excel-fil (.xlsx), eller hashen (eller starten av den) til et lagret tilbud")
+    parser.add_argument("-o", "--output", default="alle_varer_og_avvik.xlsx", help="hvor rapporten skal skrives; formatet følger filendelsen (xlsx, csv eller parquet, standard: %(default)s)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=None, help="PDF-motor (standard: pymupdf hvis installert)")
+    parser.add_argument("--excel-motor", choices=sorted(OFFER_ENGINES), default=None, help="motor for å lese tilbudet (standard: calamine hvis installert)")
+    parser.add_argument("--workers", type=int, default=None, help="antall prosesser (standard: antall kjerner)")
+    parser.add_argument("--katalog", default=DEFAULT_CATALOG_PATH, help="tilbudskatalogen (standard: %(default)s)")
+    parser.add_argument("--profil", action="store_true", help="skriv tid og minnebruk per steg som JSON-linjer til stderr")
+    parser.add_argument("-v", "--verbose", action="store_true", help="vis advarsler fra tolkingen")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR, format="%(levelname)s %(name)s: %(message)s")
+
+    fmt = os.path.splitext(args.output)[1].lstrip(".").lower() or "xlsx"
+    if fmt not in EXPORT_FORMATS:
+        print(f"Ukjent rapportformat .{fmt} (gyldige: {', '.join(EXPORT_FORMATS)})", file=sys.stderr)
+        return 2
+
+    if args.profil:
+        enable_json_log()
+    profiler = Profiler(trace_memory=args.profil, pdf_motor=args.backend, excel_motor=args.excel_motor)
+
+    paths = find_invoices(args.fakturaer)
+    if not paths:
+        print(f"Fant ingen PDF-filer i {args.fakturaer}", file=sys.stderr)
+        return 2
+
+    # Tilbudet hentes før tolkingen, så en feil hash eller et tomt tilbud oppdages med en gang
+    catalog = OfferCatalog(args.katalog)
+    try:
+        with profiler.stage("tilbud_import"):
+            offer_hash = resolve_offer(catalog, args.tilbud, args.excel_motor)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 2
+
+    if not catalog.offer_info(offer_hash)["rader"]:
+        print("Kunne ikke lese tilbudsdata fra Excel-filen.", file=sys.stderr)
+        return 1
+
+    results = []
+    with profiler.stage("faktura_tolking", filer=len(paths)) as record:
+        for result in parse_invoices([(path, path) for path in paths], args.backend, args.workers):
+            results.append(result)
+            profiler.record_pages(result["navn"], result["sidetider"])
+            if result["feil"] is None:
+                print(f"{result['navn']}: fakturanummer {result['header']['Fakturanummer']}, {len(result['data'])} linjer")
+            else:
+                print(f"{result['navn']}: {result['feil']}", file=sys.stderr)
+        record["sider"] = sum(len(r["sidetider"]) for r in results)
+        record["rader"] = sum(len(r["data"]) for r in results)
+
+    invoice_data = combine_invoice_data(results)
+    if invoice_data.empty:
+        print("Ingen av fakturaene kunne leses.", file=sys.stderr)
+        return 1
+
+    with profiler.stage("tilbud_oppslag") as record:
+        offer_data = catalog.offer_for_invoice(offer_hash, invoice_data)
+        record["rader"] = len(offer_data)
+
+    result = compare_invoice_to_offer(invoice_data, offer_data, profiler)
+    with profiler.stage("eksport", format=fmt) as record:
+        write_report(result, args.output, fmt)
+        record["rader"] = len(result["avvik"]) + len(result["kun_i_faktura"])
+
+    print(f"{len(result['avvik'])} avvik og {len(result['kun_i_faktura'])} varenummer bare i faktura skrevet til {args.output}")
+    return 1 if any(r["feil"] is not None for r in results) else 0
@@ -0,0 +1,149 @@
+"""Sammenligning av fakturalinjer mot tilbud.
+
+Alle steg er kolonnevise operasjoner med faste datatyper, så tiden vokser lineært med
+antall rader i sammenslåingen (se ``benchmarks/bench_compare.py``). Står et varenummer på
+flere linjer i tilbudet, slås linjene sammen til én (:func:`collapse_offer`) før
+sammenslåingen, så hver fakturalinje gir nøyaktig én rad.
+"""
+
+from contextlib import nullcontext
+
+import pandas as pd
+
+from .offer import parse_norwegian_number
+
+# Kolonner som alltid skal være flyttall i sammenligningen
+NUMERIC_COLUMNS = ["Antall_Faktura", "Antall_Tilbud", "Enhetspris_Faktura", "Enhetspris_Tilbud", "Rabatt"]
+
+
+def normalize_article_numbers(values):
+    """Gjør varenumre om til tekst, slik at tall fra Excel og tekst fra PDF kan slås sammen.
+
+    Hele tall som Excel har lest som flyttall (``1234.0``) blir ``"1234"``.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.astype("float64")
+        if (numbers.dropna() % 1 == 0).all():
+            return numbers.astype("Int64").astype("string")
+    elif values.dtype == object:
+        values = values.map(_integral_float_to_int)
+    return values.astype("string").str.strip()
+
+
+def _integral_float_to_int(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _to_float(values):
+    """Gjør en kolonne om til flyttall. Tekst som ikke er et vanlig tall, f.eks. kreditbeløpet
+    «-25,00» som tolkeren lar stå som tekst, leses som norsk tall."""
+    numbers = pd.to_numeric(values, errors='coerce').astype("float64")
+    if pd.api.types.is_numeric_dtype(values):
+        return numbers
+    text = numbers.isna() & values.notna()
+    if text.any():
+        numbers[text] = values[text].map(parse_norwegian_number)
+    return numbers
+
+
+def invoice_unit_prices(invoice_data):
+    """Enhetsprisen på fakturalinjene som flyttall.
+
+    Der enhetsprisen mangler og rabattkolonnen har en verdi, har tolkeren lest prisen inn i
+    rabattkolonnen, så den brukes i stedet.
+    """
+    unit_price = _to_float(invoice_data["Enhetspris_Faktura"])
+    discount = _to_float(invoice_data["Rabatt"])
+    return unit_price.mask(unit_price.isna() & discount.notna(), discount)
+
+
+def collapse_offer(offer_data):
+    """Slår sammen tilbudslinjer med samme varenummer til én linje per varenummer.
+
+    Antall og totalpris summeres, enhetsprisen blir snittet vektet med antall (eller vanlig
+    snitt når antallet mangler), og beskrivelse og enhet hentes fra første linje. Tilbud uten
+    doble varenumre returneres uendret.
+    """
+    if not offer_data["Varenummer"].duplicated().any():
+        return offer_data
+
+    quantity = _to_float(offer_data["Antall_Tilbud"])
+    unit_price = _to_float(offer_data["Enhetspris_Tilbud"])
+    lines = offer_data.assign(
+        Antall_Tilbud=quantity,
+        Enhetspris_Tilbud=unit_price,
+        _vektet=quantity * unit_price,
+        _vekt=quantity.where(unit_price.notna()),
+    )
+    if "Totalt pris" in lines:
+        lines["Totalt pris"] = _to_float(lines["Totalt pris"])
+    grouped = lines.groupby("Varenummer", sort=False, dropna=False)
+    collapsed = grouped.first()
+    for column in ("Antall_Tilbud", "Totalt pris", "_vektet", "_vekt"):
+        if column in lines:
+            collapsed[column] = grouped[column].sum(min_count=1)
+    weighted = collapsed["_vektet"] / collapsed["_vekt"]
+    collapsed["Enhetspris_Tilbud"] = weighted.where(collapsed["_vekt"] > 0, grouped["Enhetspris_Tilbud"].mean())
+    return collapsed.drop(columns=["_vektet", "_vekt"]).reset_index()[list(offer_data.columns)]
+
+
+def compare_invoice_to_offer(invoice_data, offer_data, profiler=None):
+    """Sammenligner fakturalinjer mot et normalisert tilbud.
+
+    Returnerer ``{"samlet", "avvik", "kun_i_faktura"}``: hele sammenslåingen, radene der
+    antall eller enhetspris avviker fra tilbudet, og varenumrene som bare finnes i fakturaen.
+    Med en :class:`~sjekkfaktura.profiling.Profiler` måles sammenslåingen og
+    avviksberegningen som egne steg.
+    """
+    def stage(name):
+        return profiler.stage(name) if profiler is not None else nullcontext({})
+
+    with stage("sammenslåing") as record:
+        merged_data = _merge(invoice_data, offer_data)
+        record["rader"] = len(merged_data)
+
+    with stage("avviksberegning") as record:
+        result = _deviations(merged_data)
+        record["rader"] = len(result["avvik"]) + len(result["kun_i_faktura"])
+    return result
+
+
+def _merge(invoice_data, offer_data):
+    offer_data = collapse_offer(offer_data.assign(Varenummer=normalize_article_numbers(offer_data["Varenummer"])))
+    invoice_data = invoice_data.assign(Varenummer=normalize_article_numbers(invoice_data["Varenummer"]))
+
+    # Merge faktura- og tilbudsdataene. Tilbudet har nå ett varenummer per linje, så doble
+    # varenumre på fakturaen gir ikke lenger flere rader per fakturalinje. Antall rader
+    # sjekkes i benchmarks/bench_compare.py i stedet for med validate= her, som koster tid.
+    return pd.merge(offer_data, invoice_data, on="Varenummer", how='outer', suffixes=('_Tilbud', '_Faktura'))
+
+
+def _deviations(merged_data):
+    # Konverter kolonner til numerisk der det er relevant
+    for column in NUMERIC_COLUMNS:
+        merged_data[column] = _to_float(merged_data[column])
+
+    discount = merged_data["Rabatt"]
+
+    # Flytt verdier fra "Rabatt" til "Enhetspris_Faktura" der enhetsprisen mangler
+    unit_price = invoice_unit_prices(merged_data)
+    # Fjern verdiene fra rabattkolonnen der de er flyttet
+    merged_data["Rabatt"] = discount.mask(unit_price == discount)
+    merged_data["Enhetspris_Faktura"] = unit_price
+
+    # Finne avvik
+    merged_data["Avvik_Antall"] = merged_data["Antall_Faktura"] - merged_data["Antall_Tilbud"]
+    merged_data["Avvik_Enhetspris"] = unit_price - merged_data["Enhetspris_Tilbud"]
+    merged_data["Prosentvis_økning"] = merged_data["Avvik_Enhetspris"] / merged_data["Enhetspris_Tilbud"] * 100
+
+    # Filtrer avvik. NaN != 0 er sann, så notna() må være med som i den radvise versjonen
+    quantity_deviation = merged_data["Avvik_Antall"].notna() & (merged_data["Avvik_Antall"] != 0)
+    price_deviation = merged_data["Avvik_Enhetspris"].notna() & (merged_data["Avvik_Enhetspris"] != 0)
+    avvik = merged_data[quantity_deviation | price_deviation]
+
+    # Artikler som finnes i faktura, men ikke i tilbud
+    only_in_invoice = merged_data[merged_data['Enhetspris_Tilbud'].isna()]
+
+    return {"samlet": merged_data, "avvik": avvik, "kun_i_faktura": only_in_invoice}
@@ -0,0 +1,134 @@
+"""Eksport av avviksrapporter.
+
+Rapporten har to deler: avvikene og varenumrene som bare finnes i fakturaen. Som
+Excel blir de to ark skrevet i én gjennomgang med xlsxwriter i ``constant_memory``-modus,
+der hver rad skrives til disk med en gang. CSV og Parquet strømmes rett fra
+sammenligningsresultatet med en kolonne ``Rapport`` som sier hvilken del raden hører til.
+Parquet skrives med ett fast skjema for begge delene: tallkolonnene som flyttall og resten
+som tekst, så en linje der tolkeren har latt et beløp stå som tekst ikke gir blandede typer.
+"""
+
+import io
+import os
+import tempfile
+
+import pandas as pd
+
+from .offer import parse_norwegian_number
+
+# Delene av rapporten: nøkkel i sammenligningsresultatet og navn på arket
+REPORT_SHEETS = {
+    "avvik": "Avvik",
+    "kun_i_faktura": "Kun i faktura",
+}
+
+CSV_CHUNK_ROWS = 50_000
+
+# Kolonnene i rapporten som skal være tall; alle andre skrives som tekst i Parquet
+NUMERIC_REPORT_COLUMNS = {
+    "Antall_Tilbud", "Enhetspris_Tilbud", "Totalt pris", "Antall_Faktura", "Enhetspris_Faktura",
+    "Rabatt", "Beløp_Faktura", "Avvik_Antall", "Avvik_Enhetspris", "Prosentvis_økning",
+}
+
+
+def _excel_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value
+
+
+def write_excel_report(result, target):
+    """Skriver rapporten som Excel med ett ark per del. ``target`` er en sti eller et binært filobjekt."""
+    import xlsxwriter
+
+    # Prosentvis økning blir uendelig når tilbudsprisen er 0; Excel viser det som #NUM!
+    workbook = xlsxwriter.Workbook(target, {"constant_memory": True, "nan_inf_to_errors": True})
+    bold = workbook.add_format({"bold": True})
+    try:
+        for key, sheet_name in REPORT_SHEETS.items():
+            frame = result[key]
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, [str(column) for column in frame.columns], bold)
+            for row_number, row in enumerate(frame.itertuples(index=False, name=None), start=1):
+                worksheet.write_row(row_number, 0, [_excel_value(value) for value in row])
+    finally:
+        workbook.close()
+
+
+def write_csv_report(result, target):
+    """Skriver rapporten som semikolonseparert CSV med desimalkomma, slik norsk Excel leser den."""
+    is_path = isinstance(target, (str, os.PathLike))
+    handle = open(target, "w", encoding="utf-8-sig", newline="") if is_path else io.TextIOWrapper(target, encoding="utf-8-sig", newline="")
+    try:
+        for index, (key, sheet_name) in enumerate(REPORT_SHEETS.items()):
+            frame = result[key]
+            columns = ["Rapport", *frame.columns]
+            for start in range(0, max(len(frame), 1), CSV_CHUNK_ROWS):
+                chunk = frame.iloc[start:start + CSV_CHUNK_ROWS].assign(Rapport=sheet_name)[columns]
+                chunk.to_csv(handle, sep=";", decimal=",", index=False, header=index == 0 and start == 0)
+    finally:
+        if is_path:
+            handle.close()
+        else:
+            # Ikke lukk filobjektet vi fikk; bare tøm bufferen og løs det fra wrapperen
+            handle.flush()
+            handle.detach()
+
+
+def write_parquet_report(result, target):
+    """Skriver rapporten som Parquet med én radgruppe per del."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = list(dict.fromkeys(str(column) for key in REPORT_SHEETS for column in result[key].columns))
+    columns.append("Rapport")
+    schema = pa.schema([
+        pa.field(column, pa.float64() if column in NUMERIC_REPORT_COLUMNS else pa.string()) for column in columns
+    ])
+    with pq.ParquetWriter(target, schema) as writer:
+        for key, sheet_name in REPORT_SHEETS.items():
+            frame = _typed_report(result[key].assign(Rapport=sheet_name), columns)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+
+def _typed_report(frame, columns):
+    """Gir hver kolonne i ``columns`` en fast type: flyttall for tallkolonnene, ellers tekst."""
+    frame = frame.rename(columns=str)
+    typed = pd.DataFrame(index=frame.index)
+    for column in columns:
+        values = frame[column] if column in frame else pd.Series(None, index=frame.index, dtype="object")
+        if column not in NUMERIC_REPORT_COLUMNS:
+            typed[column] = values.astype("string")
+        elif pd.api.types.is_numeric_dtype(values):
+            typed[column] = values.astype("float64")
+        else:
+            # Tekst som «-25,00» som tolkeren ikke har gjort om til tall
+            typed[column] = pd.to_numeric(values.map(parse_norwegian_number, na_action="ignore"), errors="coerce").astype("float64")
+    return typed
+
+
+EXPORT_FORMATS = {
+    "xlsx": (write_excel_report, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (write_csv_report, "text/csv"),
+    "parquet": (write_parquet_report, "application/vnd.apache.parquet"),
+}
+
+
+def write_report(result, target, fmt="xlsx"):
+    """Skriver rapporten i formatet ``fmt`` (xlsx, csv eller parquet) til en sti eller et filobjekt."""
+    try:
+        writer, _ = EXPORT_FORMATS[fmt]
+    except KeyError:
+        raise ValueError(f"Ukjent rapportformat: {fmt!r} (gyldige: {', '.join(EXPORT_FORMATS)})") from None
+    writer(result, target)
+
+
+def report_bytes(result, fmt="xlsx"):
+    """Lager rapporten og returnerer den som bytes, f.eks. for en nedlastingsknapp.
+
+    Rapporten bygges i en midlertidig fil, så bare den ferdige filen holdes i minnet.
+    """
+    with tempfile.TemporaryFile() as f:
+        write_report(result, f, fmt)
+        f.seek(0)
+        return f.read()
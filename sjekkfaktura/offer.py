@@ -0,0 +1,150 @@
+"""Innlesing og normalisering av tilbud fra Brødrene Dahl (Excel).
+
+Tilbudene kan ha hundretusenvis av rader, men bare seks kolonner brukes. I stedet for
+``pd.read_excel`` finner vi overskriftsraden og leser bare de kolonnene vi trenger,
+rad for rad: med python-calamine når det er installert, ellers med openpyxl i
+``read_only``-modus. Tall i norsk format («1.234,50») tolkes underveis.
+"""
+
+import logging
+import math
+import re
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Riktige kolonnenavn fra Excel-filen for tilbud
+OFFER_COLUMNS = {
+    'VARENR': 'Varenummer',
+    'BESKRIVELSE': 'Beskrivelse_Tilbud',
+    'ANTALL': 'Antall_Tilbud',
+    'ENHET': 'Enhet_Tilbud',
+    'ENHETSPRIS': 'Enhetspris_Tilbud',
+    'TOTALPRIS': 'Totalt pris'
+}
+NUMERIC_OFFER_COLUMNS = {'ANTALL', 'ENHETSPRIS', 'TOTALPRIS'}
+
+# Så mange rader søkes gjennom for å finne overskriftsraden med VARENR
+HEADER_SEARCH_ROWS = 50
+
+_THOUSANDS = re.compile(r"^-?\d{1,3}(\.\d{3})+$")
+
+
+def parse_norwegian_number(value):
+    """Gjør en celleverdi om til flyttall. Tekst som «1.234,50» og «1 234» forstås; ellers NaN."""
+    if value is None:
+        return math.nan
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+
+    text = str(value).strip().replace("\xa0", "").replace(" ", "")
+    if "," in text or _THOUSANDS.match(text):
+        text = text.replace(".", "").replace(",", ".")
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan
+
+
+def normalize_offer(offer_data):
+    """Gir kolonnene i et tilbud navnene sammenligningen forventer."""
+    return offer_data.rename(columns=OFFER_COLUMNS)
+
+
+def _rows_calamine(file):
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_filelike(file) if hasattr(file, "read") else CalamineWorkbook.from_path(file)
+    yield from workbook.get_sheet_by_index(0).iter_rows()
+
+
+def _rows_openpyxl(file):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _calamine_available():
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+OFFER_ENGINES = {
+    "calamine": _rows_calamine,
+    "openpyxl": _rows_openpyxl,
+}
+
+
+def available_offer_engines():
+    return [engine for engine in OFFER_ENGINES if engine != "calamine" or _calamine_available()]
+
+
+def default_offer_engine():
+    return "calamine" if _calamine_available() else "openpyxl"
+
+
+def read_offer(file, engine=None):
+    """Leser tilbudet fra en Excel-fil (sti eller filobjekt) og normaliserer kolonnene.
+
+    Bare kolonnene i :data:`OFFER_COLUMNS` leses. Statistikk for innlesingen (motor, rader,
+    sekunder og rader per sekund) legges i ``offer_data.attrs["innlesing"]``.
+    """
+    engine = engine or default_offer_engine()
+    if engine not in OFFER_ENGINES:
+        raise ValueError(f"Ukjent Excel-motor: {engine!r} (gyldige: {', '.join(OFFER_ENGINES)})")
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+    start = time.perf_counter()
+    rows = OFFER_ENGINES[engine](file)
+
+    # Finn overskriftsraden og hvilke kolonner vi trenger fra den
+    positions = None
+    for index, row in enumerate(rows):
+        if index >= HEADER_SEARCH_ROWS:
+            break
+        names = [str(cell).strip().upper() if cell is not None else "" for cell in row]
+        if "VARENR" in names:
+            positions = {name: names.index(name) for name in OFFER_COLUMNS if name in names}
+            break
+    if positions is None:
+        raise ValueError(f"Fant ikke kolonnen VARENR i de første {HEADER_SEARCH_ROWS} radene i tilbudet.")
+
+    columns = {name: [] for name in positions}
+    wanted = list(positions.items())
+    for row in rows:
+        values = [row[position] if position < len(row) else None for _, position in wanted]
+        # Hopp over helt tomme rader (calamine gir tom tekst for tomme celler)
+        if all(value is None or value == "" for value in values):
+            continue
+        for (name, _), value in zip(wanted, values):
+            if name in NUMERIC_OFFER_COLUMNS:
+                value = parse_norwegian_number(value)
+            elif value == "":
+                value = None
+            columns[name].append(value)
+
+    offer_data = pd.DataFrame(columns)
+    for name in OFFER_COLUMNS:
+        if name not in offer_data:
+            offer_data[name] = math.nan if name in NUMERIC_OFFER_COLUMNS else None
+    offer_data = normalize_offer(offer_data[list(OFFER_COLUMNS)])
+
+    seconds = time.perf_counter() - start
+    offer_data.attrs["innlesing"] = {
+        "motor": engine,
+        "rader": len(offer_data),
+        "sekunder": seconds,
+        "rader_per_sekund": len(offer_data) / seconds if seconds > 0 else float("inf"),
+    }
+    logger.info("Leste %s tilbudsrader med %s på %.2f s (%.0f rader/s)", len(offer_data), engine, seconds, offer_data.attrs["innlesing"]["rader_per_sekund"])
+    return offer_data
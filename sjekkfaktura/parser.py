@@ -0,0 +1,184 @@
+"""Tolking av artikkellinjer fra fakturaer fra Brødrene Dahl.
+
+Fakturaen leses side for side. Fakturanummer og annen metadata hentes fra hodet, og
+alle linjer etter overskriften «Artikkel» tolkes som artikkellinjer med kolonnene
+løpenummer, varenummer, beskrivelse, antall, enhetspris, rabatt og beløp.
+"""
+
+import logging
+import re
+
+from .lineparser import ArticleRows
+from .pdf_backends import get_backend
+from .profiling import timed
+
+logger = logging.getLogger(__name__)
+
+# Mønstre for metadata i fakturahodet
+HEADER_PATTERNS = {
+    "Fakturanummer": re.compile(r"Fakturanummer\s*[:\-]?\s*(\d+)", re.IGNORECASE),
+    "Fakturadato": re.compile(r"Fakturadato\s*[:\-]?\s*(\d{1,2}\.\d{1,2}\.\d{2,4})", re.IGNORECASE),
+    "Kundenummer": re.compile(r"Kundenummer\s*[:\-]?\s*(\d+)", re.IGNORECASE),
+    "Ordrenummer": re.compile(r"Ordrenummer\s*[:\-]?\s*(\d+)", re.IGNORECASE),
+}
+
+# Overskriften i artikkeltabellen; linjene under den er artikkellinjer
+TABLE_HEADER = "Artikkel"
+
+
+def update_header(header, text):
+    """Fyller inn metadatafelter som ikke er funnet ennå fra teksten på en side."""
+    for field, pattern in HEADER_PATTERNS.items():
+        if field not in header:
+            match = pattern.search(text)
+            if match:
+                header[field] = match.group(1)
+
+
+def parse_text_lines(text, doc_type, start_reading):
+    """Tolker linjene på én side.
+
+    Returnerer ``(rader, start_reading, header_at)`` der ``rader`` er en
+    :class:`~sjekkfaktura.lineparser.ArticleRows` og ``header_at`` er antall rader som ble
+    tolket før første «Artikkel»-overskrift på siden, eller None om siden ikke har noen
+    overskrift.
+    """
+    rows = ArticleRows(doc_type)
+    add_line = rows.add_line
+    header_at = None
+    is_invoice = doc_type == "Faktura"
+    for line in text.split('\n'):
+        if is_invoice and TABLE_HEADER in line:
+            start_reading = True
+            if header_at is None:
+                header_at = len(rows)
+            continue
+
+        if start_reading:
+            add_line(line)
+    return rows, start_reading, header_at
+
+
+def parse_invoice(file, doc_type="Faktura", backend=None):
+    """Leser fakturaen i én gjennomgang og gir fra seg ett resultat per side.
+
+    Hvert resultat er ``{"side", "antall_sider", "header", "rader", "sekunder"}`` der
+    ``rader`` er en :class:`~sjekkfaktura.lineparser.ArticleRows` og ``sekunder`` er tiden
+    PDF-motoren brukte på å hente ut teksten (None for de tilbakeholdte linjene som kommer
+    til slutt når fakturanummeret mangler). Bare teksten til én side holdes i minnet om
+    gangen. Artikkellinjene får fakturanummeret i UnikID så snart det er kjent; linjer som
+    kommer før nummeret holdes tilbake til det er funnet. ``backend``
+    velger PDF-motor (se :mod:`sjekkfaktura.pdf_backends`).
+    """
+    header = {}
+    pending = ArticleRows(doc_type)
+    start_reading = False
+    page_number = page_count = 0
+
+    for (page_number, page_count, text), seconds in timed(get_backend(backend).iter_page_texts(file)):
+        if text is None:
+            logger.warning("Ingen tekst funnet på side %s i PDF-filen.", page_number)
+            text = ""
+
+        update_header(header, text)
+        rows, start_reading, _ = parse_text_lines(text, doc_type, start_reading)
+
+        invoice_number = header.get("Fakturanummer")
+        if invoice_number is None:
+            pending.extend(rows)
+            rows = ArticleRows(doc_type)
+        else:
+            if len(pending):
+                rows = pending.extend(rows)
+                pending = ArticleRows(doc_type)
+            rows.invoice_number = invoice_number
+
+        yield {"side": page_number, "antall_sider": page_count, "header": dict(header), "rader": rows, "sekunder": seconds}
+
+    # Uten fakturanummer brukes varenummeret alene som UnikID
+    if len(pending):
+        yield {"side": page_number, "antall_sider": page_count, "header": dict(header), "rader": pending, "sekunder": None}
+
+
+def parse_page_range(file, pages=None, doc_type="Faktura", backend=None):
+    """Tolker et utvalg sider uavhengig av resten av fakturaen.
+
+    Brukes når lange fakturaer deles mellom prosesser. Siden vi ikke vet om «Artikkel»
+    allerede er passert på en tidligere side, tolkes alle linjer, og ``header_at`` sier
+    hvor mange rader som kom før første overskrift i utvalget. :func:`combine_page_ranges`
+    bruker dette til å gi samme rader som en gjennomgang av hele fakturaen. ``sidetider``
+    er uttrekkstiden per side som ``[(sidenummer, sekunder), ...]``.
+    """
+    header = {}
+    rows = ArticleRows(doc_type)
+    header_at = None
+    page_count = 0
+    page_times = []
+
+    for (page_number, page_count, text), seconds in timed(get_backend(backend).iter_page_texts(file, pages)):
+        page_times.append((page_number, seconds))
+        if text is None:
+            logger.warning("Ingen tekst funnet på side %s i PDF-filen.", page_number)
+            text = ""
+
+        update_header(header, text)
+        page_rows, _, page_header_at = parse_text_lines(text, doc_type, True)
+        if header_at is None and page_header_at is not None:
+            header_at = len(rows) + page_header_at
+        rows.extend(page_rows)
+
+    return {"header": header, "rader": rows, "header_at": header_at, "antall_sider": page_count, "sidetider": page_times}
+
+
+def combine_page_ranges(results):
+    """Slår sammen resultater fra :func:`parse_page_range` i siderekkefølge.
+
+    Returnerer ``(header, rader)`` der radene får fakturanummeret i UnikID når det er funnet.
+    """
+    header = {}
+    rows = None
+    for result in results:
+        for field, value in result["header"].items():
+            header.setdefault(field, value)
+        if rows is not None:
+            rows.extend(result["rader"])
+        elif result["header_at"] is not None:
+            rows = result["rader"].tail(result["header_at"])
+
+    if rows is None:
+        rows = ArticleRows()
+    rows.invoice_number = header.get("Fakturanummer")
+    return header, rows
+
+
+def get_invoice_number(file, backend=None):
+    """Returnerer fakturanummeret, eller None hvis det ikke finnes i PDF-filen."""
+    for result in parse_invoice(file, backend=backend):
+        if "Fakturanummer" in result["header"]:
+            return result["header"]["Fakturanummer"]
+    return None
+
+
+def extract_data_from_pdf(file, doc_type="Faktura", invoice_number=None, backend=None, profiler=None):
+    """Leser alle artikkellinjene i fakturaen til en DataFrame.
+
+    Er ``invoice_number`` oppgitt, brukes det i UnikID i stedet for nummeret i PDF-en. Med en
+    :class:`~sjekkfaktura.profiling.Profiler` registreres uttrekkstiden for hver side.
+    """
+    rows = ArticleRows(doc_type)
+    header = {}
+    page_times = []
+    for result in parse_invoice(file, doc_type, backend):
+        rows.extend(result["rader"])
+        header = result["header"]
+        if result["sekunder"] is not None:
+            page_times.append((result["side"], result["sekunder"]))
+
+    if profiler is not None:
+        profiler.record_pages(str(file) if isinstance(file, str) else getattr(file, "name", "faktura"), page_times)
+
+    if len(rows) == 0:
+        logger.warning("Ingen data ble funnet i PDF-filen.")
+
+    rows.invoice_number = invoice_number or header.get("Fakturanummer")
+    return rows.to_frame()
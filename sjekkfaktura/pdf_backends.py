@@ -0,0 +1,149 @@
+"""Utbyttbare motorer for å hente tekst ut av PDF-fakturaer.
+
+Alle motorene gir fra seg teksten side for side som ``(sidenummer, antall_sider, tekst)``,
+eventuelt bare for et utvalg sider (1-basert, slik at lange fakturaer kan deles mellom prosesser),
+med én linje per tekstrad slik ``pdfplumber.Page.extract_text`` lager den. Da kan
+artikkellinjetolkeren brukes uendret uansett motor.
+"""
+
+import os
+from io import BytesIO
+
+# Samme toleranse som pdfplumber bruker for å samle ord på samme linje
+Y_TOLERANCE = 3
+
+
+def read_bytes(file):
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            return f.read()
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return file.read()
+
+
+class ExtractionBackend:
+    """Grensesnitt for en tekstmotor. Underklasser implementerer ``iter_page_texts``."""
+
+    name = None
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def page_count(self, file):
+        raise NotImplementedError
+
+    def iter_page_texts(self, file, pages=None):
+        raise NotImplementedError
+
+
+class PdfplumberBackend(ExtractionBackend):
+    name = "pdfplumber"
+
+    @staticmethod
+    def _open(file, pages=None):
+        import pdfplumber
+
+        if isinstance(file, (bytes, bytearray)):
+            file = BytesIO(file)
+        elif hasattr(file, "seek"):
+            file.seek(0)
+        return pdfplumber.open(file, pages=list(pages) if pages is not None else None)
+
+    def page_count(self, file):
+        with self._open(file) as pdf:
+            return len(pdf.pages)
+
+    def iter_page_texts(self, file, pages=None):
+        from pdfminer.pdftypes import resolve1
+
+        with self._open(file, pages) as pdf:
+            # Med et utvalg sider inneholder pdf.pages bare disse, så totalen hentes fra dokumentet
+            page_count = resolve1(pdf.doc.catalog["Pages"])["Count"] if pages is not None else len(pdf.pages)
+            for page in pdf.pages:
+                text = page.extract_text()
+                # pdfplumber mellomlagrer tegn og objekter per side, så vi slipper dem før neste side
+                page.flush_cache()
+                yield page.page_number, page_count, text
+
+
+class PyMuPDFBackend(ExtractionBackend):
+    name = "pymupdf"
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import fitz  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def page_count(self, file):
+        import fitz
+
+        with fitz.open(stream=read_bytes(file), filetype="pdf") as doc:
+            return doc.page_count
+
+    def iter_page_texts(self, file, pages=None):
+        import fitz
+
+        with fitz.open(stream=read_bytes(file), filetype="pdf") as doc:
+            page_count = doc.page_count
+            for index in (p - 1 for p in pages) if pages is not None else range(page_count):
+                page = doc.load_page(index)
+                words = page.get_text("words")
+                yield index + 1, page_count, words_to_text(words)
+
+
+def words_to_text(words):
+    """Setter sammen ord ``(x0, top, x1, bottom, tekst, ...)`` til linjer slik pdfplumber gjør.
+
+    Ord samles på samme linje når toppkoordinaten ligger innenfor ``Y_TOLERANCE`` av
+    forrige ord i linjen, og sorteres fra venstre mot høyre innenfor linjen.
+    """
+    if not words:
+        return ""
+
+    lines = []
+    current = []
+    last_top = None
+    for word in sorted(words, key=lambda w: w[1]):
+        if last_top is not None and word[1] > last_top + Y_TOLERANCE:
+            lines.append(current)
+            current = []
+        current.append(word)
+        last_top = word[1]
+    lines.append(current)
+
+    return "\n".join(" ".join(w[4] for w in sorted(line, key=lambda w: w[0])) for line in lines)
+
+
+BACKENDS = {
+    PyMuPDFBackend.name: PyMuPDFBackend,
+    PdfplumberBackend.name: PdfplumberBackend,
+}
+
+# PyMuPDF er klart raskest på fakturaene våre og brukes som standard når den er installert
+DEFAULT_BACKEND = PyMuPDFBackend.name
+
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend.is_available()]
+
+
+def get_backend(name=None):
+    """Returnerer en motor etter navn. Uten navn brukes standardmotoren, eller pdfplumber
+    hvis PyMuPDF ikke er installert."""
+    if isinstance(name, ExtractionBackend):
+        return name
+    if name is None:
+        name = DEFAULT_BACKEND if BACKENDS[DEFAULT_BACKEND].is_available() else PdfplumberBackend.name
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Ukjent PDF-motor: {name!r} (gyldige: {', '.join(BACKENDS)})") from None
@@ -0,0 +1,112 @@
+"""Måling av tid og minne per steg i fakturasjekken.
+
+Hvert steg registreres med veggklokketid, valgfri ekstra informasjon (sider, rader)
+og største minnebruk: toppen av Python-allokeringene i steget når ``trace_memory`` er
+slått på (tracemalloc), og prosessens største RSS så langt. Alle steg skrives også som
+én JSON-linje til loggeren ``sjekkfaktura.profiling``, så de kan samles opp i
+produksjon. :func:`enable_json_log` kobler loggeren til stderr.
+"""
+
+import json
+import logging
+import sys
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss er i kilobyte på Linux og i byte på macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def timed(iterable):
+    """Gir ``(element, sekunder)`` der sekundene er tiden det tok å hente elementet."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        yield item, time.perf_counter() - start
+
+
+class Profiler:
+    def __init__(self, trace_memory=False, **context):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.trace_memory = trace_memory
+        self.context = context
+        self.stages = []
+        self.page_times = []
+
+    def _log(self, event, record):
+        logger.info(json.dumps({"hendelse": event, "kjøring": self.run_id, **self.context, **record}, ensure_ascii=False, default=str))
+
+    @contextmanager
+    def stage(self, name, **info):
+        """Måler et steg. Den returnerte ordboken kan fylles med f.eks. ``rader`` underveis."""
+        record = {"steg": name, **info}
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["sekunder"] = time.perf_counter() - start
+            if self.trace_memory:
+                record["topp_python_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+                if started_tracing:
+                    tracemalloc.stop()
+            record["topp_rss_mb"] = _peak_rss_mb()
+            self.stages.append(record)
+            self._log("steg", record)
+
+    def record_pages(self, name, page_times):
+        """Registrerer uttrekkstid per side, ``[(sidenummer, sekunder), ...]``, for en fil."""
+        for page_number, seconds in page_times:
+            self.page_times.append({"fil": name, "side": page_number, "sekunder": seconds})
+        if page_times:
+            seconds = [s for _, s in page_times]
+            self._log("sider", {"fil": name, "sider": len(seconds), "sekunder": sum(seconds), "tregeste_side": max(seconds)})
+
+    def summary(self):
+        return {
+            "kjøring": self.run_id,
+            **self.context,
+            "sekunder": sum(stage["sekunder"] for stage in self.stages),
+            "steg": self.stages,
+        }
+
+
+class _MessageFormatter(logging.Formatter):
+    def format(self, record):
+        return record.getMessage()
+
+
+def enable_json_log(stream=None):
+    """Skriver profileringslinjene som rene JSON-linjer til ``stream`` (standard stderr). Trygt å kalle flere ganger."""
+    if any(getattr(handler, "_sjekkfaktura_json", False) for handler in logger.handlers):
+        return
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(_MessageFormatter())
+    handler._sjekkfaktura_json = True
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
@@ -0,0 +1,188 @@
+"""Fakturasjekk i bakgrunnen med delresultater underveis.
+
+:class:`ProgressiveCheck` tolker fakturaene i en egen tråd (med prosesspoolen fra
+:mod:`sjekkfaktura.batch`) og sammenligner radene mot tilbudet etter hvert som sideutvalgene
+blir ferdige. Et brukergrensesnitt kan da vise avvikene som er funnet så langt, vise
+fremdriften og avbryte kjøringen, i stedet for å vente til hele fakturaen er lest.
+
+Sideutvalgene kan bli ferdige i vilkårlig rekkefølge. For hver fil sammenlignes bare radene
+i den sammenhengende delen fra første side, og først når fakturanummeret er kjent, slik at
+delresultatene til sammen blir de samme som én sammenligning av hele fakturaen.
+
+Hver ferdig faktura legges også til løpende summer per varenummer
+(:class:`sjekkfaktura.reconcile.RunningTotals`), så :meth:`ProgressiveCheck.reconciliation`
+kan avstemme alle fakturaene så langt mot tilbudet.
+"""
+
+import logging
+import threading
+from itertools import takewhile
+
+import pandas as pd
+
+from .batch import PAGES_PER_CHUNK, file_result, iter_page_ranges, plan_files
+from .compare import compare_invoice_to_offer
+from .parser import combine_page_ranges
+from .profiling import Profiler
+from .reconcile import RunningTotals, reconciliation_report
+
+logger = logging.getLogger(__name__)
+
+RUNNING = "kjører"
+DONE = "ferdig"
+CANCELLED = "avbrutt"
+FAILED = "feilet"
+
+RESULT_KEYS = ("samlet", "avvik", "kun_i_faktura")
+
+
+class ProgressiveCheck:
+    """Tolker og sammenligner fakturaer i en bakgrunnstråd som startes med en gang.
+
+    ``files`` er ``[(navn, kilde)]`` som skal tolkes, og ``offer_lookup`` tar en tabell med
+    fakturalinjer og returnerer tilbudslinjene for dem, f.eks.
+    ``functools.partial(catalog.offer_for_invoice, offer_hash)``. ``finished`` er filresultater
+    som allerede er tolket (f.eks. fra hurtigbufferen); de sammenlignes først. ``on_result``
+    kalles i bakgrunnstråden med hvert nye filresultat, f.eks. for å lagre det i hurtigbufferen.
+    """
+
+    def __init__(self, files, offer_lookup, finished=(), backend=None, max_workers=None,
+                 pages_per_chunk=PAGES_PER_CHUNK, on_result=None, profiler=None):
+        self.profiler = profiler or Profiler()
+        self.status = RUNNING
+        self.error = None
+        self.results = []
+        self.pages_done = 0
+        self.pages_total = 0
+        self._offer_lookup = offer_lookup
+        self._on_result = on_result
+        self._parts = {}
+        self._totals = RunningTotals()
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(list(files), list(finished), backend, max_workers, pages_per_chunk),
+            name="sjekkfaktura-fakturasjekk",
+            daemon=True,
+        )
+        self._thread.start()
+
+    @property
+    def running(self):
+        return self.status == RUNNING
+
+    @property
+    def progress(self):
+        """Andelen av sidene som er lest, mellom 0 og 1."""
+        if not self.pages_total:
+            return 0.0 if self.running else 1.0
+        return min(self.pages_done / self.pages_total, 1.0)
+
+    def cancel(self):
+        """Ber tråden stoppe. Sideutvalg som ikke er startet, droppes; delresultatene beholdes."""
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def result(self):
+        """Sammenligningen så langt som ``{"samlet", "avvik", "kun_i_faktura"}``, eller None."""
+        with self._lock:
+            parts = [part for file_parts in self._parts.values() for part in file_parts]
+        if not parts:
+            return None
+        return {key: pd.concat([part[key] for part in parts], ignore_index=True) for key in RESULT_KEYS}
+
+    def reconciliation(self):
+        """Avstemming av de ferdige fakturaene mot tilbudet, se :func:`sjekkfaktura.reconcile.reconciliation_report`."""
+        with self._lock:
+            totals = self._totals.totals
+        if totals is None or totals.empty:
+            return None
+        offer_data = self._offer_lookup(totals.reset_index()[["Varenummer"]])
+        return reconciliation_report(totals, offer_data)
+
+    def _run(self, files, finished, backend, max_workers, pages_per_chunk):
+        try:
+            with self.profiler.stage("faktura_tolking", filer=len(files), fra_hurtigbuffer=len(finished)) as record:
+                for index, result in enumerate(finished):
+                    self.results.append(result)
+                    if result["feil"] is None:
+                        self._compare(("ferdig", index), result["data"])
+                        self._add_totals(result)
+                self._parse(files, backend, max_workers, pages_per_chunk)
+                record["sider"] = self.pages_done
+                record["rader"] = sum(len(result["data"]) for result in self.results)
+            status = CANCELLED if self._cancel.is_set() else DONE
+        except Exception as e:
+            logger.exception("Fakturasjekken feilet")
+            self.error = str(e)
+            status = FAILED
+        with self._lock:
+            self.status = status
+
+    def _parse(self, files, backend, max_workers, pages_per_chunk):
+        plans = plan_files(files, backend, pages_per_chunk)
+        self.pages_total = sum(plan["antall_sider"] for plan in plans)
+        chunks = {}
+        compared = {}
+        for key, plan in enumerate(plans):
+            if plan["feil"] is not None:
+                self._finish(file_result(plan["navn"], None, plan["feil"]))
+            else:
+                chunks[key] = [None] * len(plan["utvalg"])
+
+        page_ranges = iter_page_ranges(plans, backend, max_workers)
+        try:
+            for key, index, chunk, error in page_ranges:
+                if self._cancel.is_set():
+                    break
+                name = plans[key]["navn"]
+                if error is not None:
+                    # Rader fra en fil som feiler, skal ikke være med i sammenligningen
+                    del chunks[key]
+                    with self._lock:
+                        self._parts.pop(("fil", key), None)
+                    self._finish(file_result(name, None, f"Kunne ikke lese data fra PDF: {error}"))
+                    continue
+
+                chunks[key][index] = chunk
+                with self._lock:
+                    self.pages_done += len(chunk["sidetider"])
+
+                prefix = list(takewhile(lambda c: c is not None, chunks[key]))
+                header, rows = combine_page_ranges(prefix)
+                # UnikID inneholder fakturanummeret, så radene sammenlignes først når det er kjent
+                start = compared.get(key, 0)
+                if "Fakturanummer" in header and len(rows) > start:
+                    self._compare(("fil", key), rows.tail(start).to_frame())
+                    compared[key] = len(rows)
+
+                if len(prefix) == len(chunks[key]):
+                    self._finish(file_result(name, chunks.pop(key)))
+        finally:
+            page_ranges.close()
+
+    def _compare(self, file_id, invoice_data):
+        with self.profiler.stage("delsammenligning", rader=len(invoice_data)) as record:
+            offer_data = self._offer_lookup(invoice_data)
+            part = compare_invoice_to_offer(invoice_data, offer_data)
+            record["avvik"] = len(part["avvik"])
+        with self._lock:
+            self._parts.setdefault(file_id, []).append(part)
+
+    def _add_totals(self, result):
+        # Samme faktura i to filer skal bare telles én gang
+        invoice_number = result["header"].get("Fakturanummer") or result["navn"]
+        with self._lock:
+            self._totals.add(invoice_number, result["data"])
+
+    def _finish(self, result):
+        self.results.append(result)
+        if result["feil"] is None:
+            self._add_totals(result)
+        self.profiler.record_pages(result["navn"], result["sidetider"])
+        if self._on_result is not None:
+            self._on_result(result)
@@ -0,0 +1,122 @@
+"""Avstemming av mange delfakturaer mot ett tilbud.
+
+Et prosjekt faktureres ofte i mange delleveranser. Sammenligningen i
+:mod:`sjekkfaktura.compare` ser på én faktura om gangen, så hver delfaktura får avvik i
+antall, og overfakturering over flere fakturaer blir aldri oppdaget. Her holdes i stedet
+løpende summer per varenummer over alle fakturaene: fakturert antall og beløp, laveste,
+høyeste og siste enhetspris og antall fakturaer. En ny faktura legges til ved å summere
+den per varenummer og legge summene til de løpende totalene (:class:`RunningTotals`, eller
+i resultatlageret i :mod:`sjekkfaktura.results`), så ingen fakturalinjer slås sammen på
+nytt. :func:`reconciliation_report` regner ut gjenstående antall, overfakturering og
+prisavvik fra totalene.
+"""
+
+import pandas as pd
+
+from .compare import _to_float, collapse_offer, invoice_unit_prices, normalize_article_numbers
+
+# Løpende summer per varenummer; alle legges sammen ved addisjon
+SUM_COLUMNS = ["Fakturaer", "Fakturert_Antall", "Fakturert_Beløp", "Fakturert_Brutto"]
+# Laveste og høyeste enhetspris, og prisen på den sist tillagte fakturaen
+PRICE_COLUMNS = ["Laveste_Enhetspris", "Høyeste_Enhetspris", "Siste_Enhetspris"]
+TOTAL_COLUMNS = SUM_COLUMNS + PRICE_COLUMNS
+
+
+def aggregate_invoice(invoice_data):
+    """Summerer én faktura per varenummer. Returnerer en tabell med ``TOTAL_COLUMNS`` og varenummer som indeks."""
+    if invoice_data.empty:
+        return pd.DataFrame(columns=TOTAL_COLUMNS, index=pd.Index([], name="Varenummer", dtype="string"), dtype="float64")
+
+    quantity = _to_float(invoice_data["Antall_Faktura"])
+    unit_price = invoice_unit_prices(invoice_data)
+    lines = pd.DataFrame({
+        "Varenummer": normalize_article_numbers(invoice_data["Varenummer"]),
+        "Fakturert_Antall": quantity,
+        "Fakturert_Beløp": _to_float(invoice_data["Beløp_Faktura"]),
+        "Fakturert_Brutto": quantity * unit_price,
+        "Enhetspris": unit_price,
+    })
+    grouped = lines.groupby("Varenummer", sort=False)
+    totals = grouped[["Fakturert_Antall", "Fakturert_Beløp", "Fakturert_Brutto"]].sum()
+    totals.insert(0, "Fakturaer", 1.0)
+    totals["Laveste_Enhetspris"] = grouped["Enhetspris"].min()
+    totals["Høyeste_Enhetspris"] = grouped["Enhetspris"].max()
+    totals["Siste_Enhetspris"] = grouped["Enhetspris"].last()
+    return totals
+
+
+def add_totals(totals, invoice_totals):
+    """Legger summene for en ny faktura (fra :func:`aggregate_invoice`) til de løpende totalene."""
+    if totals is None or totals.empty:
+        return invoice_totals.copy()
+    index = totals.index.union(invoice_totals.index)
+    old = totals.reindex(index)
+    new = invoice_totals.reindex(index)
+    combined = old[SUM_COLUMNS].fillna(0) + new[SUM_COLUMNS].fillna(0)
+    # min() og max() hopper over manglende verdier, så varenumre som bare finnes på én side beholder prisen sin
+    combined["Laveste_Enhetspris"] = pd.concat([old["Laveste_Enhetspris"], new["Laveste_Enhetspris"]], axis=1).min(axis=1)
+    combined["Høyeste_Enhetspris"] = pd.concat([old["Høyeste_Enhetspris"], new["Høyeste_Enhetspris"]], axis=1).max(axis=1)
+    combined["Siste_Enhetspris"] = new["Siste_Enhetspris"].fillna(old["Siste_Enhetspris"])
+    return combined
+
+
+class RunningTotals:
+    """Løpende summer per varenummer for fakturaene som er lagt til, i minnet.
+
+    Hver faktura legges bare til én gang; fakturanumre som allerede er lagt til, hoppes over.
+    """
+
+    def __init__(self):
+        self.totals = None
+        self.invoices = set()
+
+    def add(self, invoice_number, invoice_data):
+        """Legger til en faktura. Returnerer False hvis fakturanummeret allerede er lagt til."""
+        if invoice_number in self.invoices:
+            return False
+        self.invoices.add(invoice_number)
+        self.totals = add_totals(self.totals, aggregate_invoice(invoice_data))
+        return True
+
+
+def reconciliation_report(totals, offer_data):
+    """Avstemmer løpende totaler mot tilbudet, én rad per varenummer.
+
+    ``offer_data`` trenger bare linjene for varenumrene i ``totals``. Kolonnene er tilbudt
+    antall og enhetspris, fakturert antall og beløp, ``Gjenstående_Antall`` (negativt når det
+    er fakturert mer enn tilbudt), ``Overfakturert_Antall`` og ``Overfakturert_Beløp`` (det
+    som er fakturert ut over tilbudt antall og tilbudt beløp), og prisavviket som
+    snittprisen vektet med antall minus tilbudt enhetspris. Varenumre som ikke står i
+    tilbudet, har ``Kun_i_faktura`` satt, og alt som er fakturert av dem, regnes som
+    overfakturert.
+    """
+    if totals is None or totals.empty:
+        return pd.DataFrame()
+
+    offer = collapse_offer(offer_data.assign(Varenummer=normalize_article_numbers(offer_data["Varenummer"])))
+    offer = offer.set_index("Varenummer")
+    report = totals.join(offer[["Beskrivelse_Tilbud", "Antall_Tilbud", "Enhetspris_Tilbud"]], how="left")
+    offered_quantity = _to_float(report["Antall_Tilbud"])
+    offered_price = _to_float(report["Enhetspris_Tilbud"])
+    report["Antall_Tilbud"] = offered_quantity
+    report["Enhetspris_Tilbud"] = offered_price
+
+    only_in_invoice = offered_price.isna() & offered_quantity.isna()
+    report["Gjenstående_Antall"] = offered_quantity - report["Fakturert_Antall"]
+    report["Overfakturert_Antall"] = (-report["Gjenstående_Antall"]).clip(lower=0).mask(only_in_invoice, report["Fakturert_Antall"])
+    report["Overfakturert_Beløp"] = (
+        (report["Fakturert_Beløp"] - offered_quantity * offered_price).clip(lower=0).mask(only_in_invoice, report["Fakturert_Beløp"])
+    )
+
+    average_price = report["Fakturert_Brutto"] / report["Fakturert_Antall"].where(report["Fakturert_Antall"] != 0)
+    report["Snittpris_Faktura"] = average_price
+    report["Prisavvik"] = average_price - offered_price
+    report["Prisavvik_Prosent"] = report["Prisavvik"] / offered_price * 100
+    report["Kun_i_faktura"] = only_in_invoice
+
+    columns = [
+        "Beskrivelse_Tilbud", "Antall_Tilbud", "Fakturert_Antall", "Gjenstående_Antall", "Overfakturert_Antall",
+        "Fakturert_Beløp", "Overfakturert_Beløp", "Enhetspris_Tilbud", "Snittpris_Faktura", "Prisavvik",
+        "Prisavvik_Prosent", "Laveste_Enhetspris", "Høyeste_Enhetspris", "Siste_Enhetspris", "Fakturaer", "Kun_i_faktura",
+    ]
+    return report[columns].reset_index()
@@ -0,0 +1,327 @@
+"""Lokalt resultatlager i SQLite for fakturaer som er sjekket.
+
+Hver fil lagres med SHA-256 av innholdet, fakturanummeret, tilbudet den ble sjekket mot og
+status (``ok``, ``duplikat`` eller ``feil``). Avvikene og varenumrene som bare finnes i
+fakturaen lagres linje for linje, så Streamlit-appen kan vise dem med en gang uten å tolke
+PDF-en på nytt. Lageret fylles av innboks-tjenesten i :mod:`sjekkfaktura.watch`. Samme fil
+kan sjekkes mot flere tilbud (eller flere versjoner av ett tilbud), så både filene og
+fakturanumrene er unike per tilbud.
+
+For avstemmingen mot tilbudet (:mod:`sjekkfaktura.reconcile`) lagres i tillegg én rad per
+varenummer og faktura med fakturert antall, beløp og enhetspriser. Totalene for et tilbud
+summeres fra disse radene, så en ny faktura bare legger til sine egne rader.
+"""
+
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from .export import REPORT_SHEETS
+from .reconcile import TOTAL_COLUMNS, aggregate_invoice
+
+DEFAULT_RESULTS_PATH = os.environ.get(
+    "SJEKKFAKTURA_RESULTS", os.path.join(os.path.expanduser("~"), ".local", "share", "sjekkfaktura", "resultater.sqlite")
+)
+
+OK = "ok"
+DUPLICATE = "duplikat"
+FAILED = "feil"
+
+# Kolonnene i tabellen deviation_lines og hvilke kolonner i sammenligningen de svarer til
+DEVIATION_COLUMNS = {
+    "varenummer": "Varenummer",
+    "beskrivelse_tilbud": "Beskrivelse_Tilbud",
+    "antall_tilbud": "Antall_Tilbud",
+    "enhet_tilbud": "Enhet_Tilbud",
+    "enhetspris_tilbud": "Enhetspris_Tilbud",
+    "totalpris": "Totalt pris",
+    "unikid": "UnikID",
+    "beskrivelse_faktura": "Beskrivelse_Faktura",
+    "antall_faktura": "Antall_Faktura",
+    "enhetspris_faktura": "Enhetspris_Faktura",
+    "rabatt": "Rabatt",
+    "belop_faktura": "Beløp_Faktura",
+    "type": "Type",
+    "avvik_antall": "Avvik_Antall",
+    "avvik_enhetspris": "Avvik_Enhetspris",
+    "prosentvis_okning": "Prosentvis_økning",
+}
+
+# Kolonnene i tabellen article_totals og hvilke kolonner i fakturasummene de svarer til
+ARTICLE_TOTAL_COLUMNS = dict(zip(
+    ("fakturaer", "fakturert_antall", "fakturert_belop", "fakturert_brutto", "laveste_enhetspris", "hoyeste_enhetspris", "siste_enhetspris"),
+    TOTAL_COLUMNS,
+))
+
+# Økes når tabellene endres; eldre lagre gjøres om i ResultStore._migrate()
+SCHEMA_VERSION = 1
+
+_INVOICE_COLUMNS = ("hash", "navn", "fakturanummer", "offer_hash", "status", "duplikat_av", "feil", "rader", "avvik", "kun_i_faktura", "behandlet")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS invoices (
+    hash TEXT NOT NULL,
+    navn TEXT NOT NULL,
+    fakturanummer TEXT,
+    offer_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duplikat_av TEXT,
+    feil TEXT,
+    rader INTEGER NOT NULL DEFAULT 0,
+    avvik INTEGER NOT NULL DEFAULT 0,
+    kun_i_faktura INTEGER NOT NULL DEFAULT 0,
+    behandlet TEXT NOT NULL,
+    PRIMARY KEY (hash, offer_hash)
+);
+CREATE INDEX IF NOT EXISTS invoices_fakturanummer ON invoices (offer_hash, fakturanummer, status);
+CREATE TABLE IF NOT EXISTS deviation_lines (
+    invoice_hash TEXT NOT NULL,
+    offer_hash TEXT NOT NULL,
+    del TEXT NOT NULL,
+    {", ".join(DEVIATION_COLUMNS)},
+    FOREIGN KEY (invoice_hash, offer_hash) REFERENCES invoices (hash, offer_hash) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS deviation_lines_invoice ON deviation_lines (invoice_hash, offer_hash, del);
+CREATE TABLE IF NOT EXISTS article_totals (
+    invoice_hash TEXT NOT NULL,
+    offer_hash TEXT NOT NULL,
+    varenummer TEXT NOT NULL,
+    {" REAL, ".join(ARTICLE_TOTAL_COLUMNS)} REAL,
+    FOREIGN KEY (invoice_hash, offer_hash) REFERENCES invoices (hash, offer_hash) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS article_totals_offer ON article_totals (offer_hash, varenummer);
+CREATE INDEX IF NOT EXISTS article_totals_invoice ON article_totals (invoice_hash, offer_hash);
+"""
+
+# Lagre fra før filene ble skilt på tilbud: tabellene flyttes til side, lages på nytt og fylles
+# fra de gamle. Filer uten tilbud (registrert som duplikat før tilbudet ble lagret) tas ikke med.
+_RENAME_V0 = """
+ALTER TABLE deviation_lines RENAME TO deviation_lines_v0;
+ALTER TABLE article_totals RENAME TO article_totals_v0;
+ALTER TABLE invoices RENAME TO invoices_v0;
+DROP INDEX IF EXISTS invoices_fakturanummer;
+DROP INDEX IF EXISTS deviation_lines_invoice;
+DROP INDEX IF EXISTS article_totals_offer;
+DROP INDEX IF EXISTS article_totals_invoice
+"""
+
+_COPY_V0 = f"""
+INSERT INTO invoices ({", ".join(_INVOICE_COLUMNS)})
+    SELECT {", ".join(_INVOICE_COLUMNS)} FROM invoices_v0 WHERE offer_hash IS NOT NULL;
+INSERT INTO deviation_lines (invoice_hash, offer_hash, del, {", ".join(DEVIATION_COLUMNS)})
+    SELECT d.invoice_hash, i.offer_hash, d.del, {", ".join(f"d.{column}" for column in DEVIATION_COLUMNS)}
+    FROM deviation_lines_v0 d JOIN invoices_v0 i ON i.hash = d.invoice_hash
+    WHERE i.offer_hash IS NOT NULL ORDER BY d.rowid;
+INSERT INTO article_totals (invoice_hash, offer_hash, varenummer, {", ".join(ARTICLE_TOTAL_COLUMNS)})
+    SELECT invoice_hash, offer_hash, varenummer, {", ".join(ARTICLE_TOTAL_COLUMNS)} FROM article_totals_v0 ORDER BY rowid;
+DROP TABLE deviation_lines_v0;
+DROP TABLE article_totals_v0;
+DROP TABLE invoices_v0
+"""
+
+
+def _statements(script):
+    return [statement for statement in script.split(";") if statement.strip()]
+
+
+class ResultStore:
+    def __init__(self, path=DEFAULT_RESULTS_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._migrate()
+
+    def _migrate(self):
+        """Lager tabellene, eller gjør om et lager med eldre oppsett, i én transaksjon."""
+        with closing(self._connect()) as con:
+            # Transaksjonen styres selv, så tjenesten og appen ikke gjør om lageret samtidig
+            con.isolation_level = None
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                if con.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                    old = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'invoices'").fetchone()
+                    for statement in _statements(_RENAME_V0) if old else []:
+                        con.execute(statement)
+                    for statement in _statements(_SCHEMA):
+                        con.execute(statement)
+                    for statement in _statements(_COPY_V0) if old else []:
+                        con.execute(statement)
+                    con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+
+    def _connect(self):
+        # Tjenesten skriver mens appen leser, så vi venter på låsen i stedet for å feile med en gang
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute("PRAGMA foreign_keys = ON")
+        return con
+
+    def has_file(self, file_hash, offer_hash):
+        """Om filen er ferdig behandlet mot tilbudet. Filer som feilet, regnes ikke med, så de kan prøves på nytt."""
+        with closing(self._connect()) as con:
+            return con.execute(
+                "SELECT 1 FROM invoices WHERE hash = ? AND offer_hash = ? AND status IN (?, ?)",
+                (file_hash, offer_hash, OK, DUPLICATE),
+            ).fetchone() is not None
+
+    def find_invoice(self, invoice_number, offer_hash):
+        """Hashen til filen som allerede er lagret med dette fakturanummeret mot tilbudet, eller None."""
+        with closing(self._connect()) as con:
+            row = con.execute(
+                "SELECT hash FROM invoices WHERE offer_hash = ? AND fakturanummer = ? AND status = ? ORDER BY behandlet LIMIT 1",
+                (offer_hash, invoice_number, OK),
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_duplicate(self, file_hash, name, invoice_number, original, offer_hash):
+        """Registrerer en fil med et fakturanummer som allerede er lagret fra filen ``original``."""
+        self._insert(file_hash, name, invoice_number, offer_hash, DUPLICATE, duplikat_av=original)
+
+    def save_result(self, file_hash, name, result, comparison, offer_hash):
+        """Lagrer en tolket faktura (fra :func:`sjekkfaktura.batch.parse_invoices`) og sammenligningen.
+
+        Er fakturanummeret allerede lagret fra en annen fil mot samme tilbud, lagres filen som
+        duplikat i stedet.
+        Returnerer statusen filen fikk.
+        """
+        invoice_number = result["header"].get("Fakturanummer")
+        if result["feil"] is not None or comparison is None:
+            self._insert(file_hash, name, invoice_number, offer_hash, FAILED, feil=result["feil"])
+            return FAILED
+
+        with closing(self._connect()) as con, con:
+            # Sjekken og innsettingen skjer i samme transaksjon, så to skrivere ikke lagrer samme faktura
+            con.execute("BEGIN IMMEDIATE")
+            original = con.execute(
+                "SELECT hash FROM invoices WHERE offer_hash = ? AND fakturanummer = ? AND status = ? AND hash != ? LIMIT 1",
+                (offer_hash, invoice_number, OK, file_hash),
+            ).fetchone()
+            if original is not None:
+                self._insert(file_hash, name, invoice_number, offer_hash, DUPLICATE, con=con, duplikat_av=original[0])
+                return DUPLICATE
+
+            self._insert(
+                file_hash, name, invoice_number, offer_hash, OK, con=con,
+                rader=len(result["data"]), avvik=len(comparison["avvik"]), kun_i_faktura=len(comparison["kun_i_faktura"]),
+            )
+            con.execute("DELETE FROM deviation_lines WHERE invoice_hash = ? AND offer_hash = ?", (file_hash, offer_hash))
+            for key in REPORT_SHEETS:
+                lines = self._to_lines(comparison[key])
+                con.executemany(
+                    f"INSERT INTO deviation_lines (invoice_hash, offer_hash, del, {', '.join(DEVIATION_COLUMNS)}) "
+                    f"VALUES (?, ?, ?{', ?' * len(DEVIATION_COLUMNS)})",
+                    ((file_hash, offer_hash, key, *row) for row in lines.itertuples(index=False, name=None)),
+                )
+
+            totals = aggregate_invoice(result["data"])
+            con.execute("DELETE FROM article_totals WHERE invoice_hash = ? AND offer_hash = ?", (file_hash, offer_hash))
+            con.executemany(
+                f"INSERT INTO article_totals (invoice_hash, offer_hash, varenummer, {', '.join(ARTICLE_TOTAL_COLUMNS)}) "
+                f"VALUES (?, ?, ?{', ?' * len(ARTICLE_TOTAL_COLUMNS)})",
+                ((file_hash, offer_hash, *row) for row in self._to_rows(totals.reset_index())),
+            )
+        return OK
+
+    def _insert(self, file_hash, name, invoice_number, offer_hash, status, con=None, **fields):
+        values = {
+            "hash": file_hash,
+            "navn": name,
+            "fakturanummer": invoice_number,
+            "offer_hash": offer_hash,
+            "status": status,
+            "behandlet": datetime.now().isoformat(timespec="seconds"),
+            **fields,
+        }
+        sql = f"INSERT OR REPLACE INTO invoices ({', '.join(values)}) VALUES ({', '.join('?' * len(values))})"
+        if con is not None:
+            con.execute(sql, tuple(values.values()))
+            return
+        with closing(self._connect()) as con, con:
+            con.execute(sql, tuple(values.values()))
+
+    @staticmethod
+    def _to_lines(frame):
+        lines = pd.DataFrame(index=frame.index)
+        for column, frame_column in DEVIATION_COLUMNS.items():
+            values = frame[frame_column] if frame_column in frame else pd.Series(None, index=frame.index, dtype="object")
+            lines[column] = values.astype("object").where(values.notna(), None)
+        return lines
+
+    @staticmethod
+    def _to_rows(frame):
+        return frame.astype("object").where(frame.notna(), None).itertuples(index=False, name=None)
+
+    def list_invoices(self, offer_hash=None, status=None):
+        """Alle lagrede filer, nyeste først, eventuelt bare for ett tilbud og/eller én status."""
+        conditions, params = [], []
+        if offer_hash is not None:
+            conditions.append("offer_hash = ?")
+            params.append(offer_hash)
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with closing(self._connect()) as con:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(_INVOICE_COLUMNS)} FROM invoices {where} ORDER BY behandlet DESC", con, params=params
+            )
+
+    def load_deviations(self, offer_hash, file_hashes):
+        """Avvikene for de oppgitte filene mot tilbudet som ``{"avvik", "kun_i_faktura"}``, klare for eksport."""
+        file_hashes = list(file_hashes)
+        placeholders = ", ".join("?" * len(file_hashes))
+        result = {}
+        with closing(self._connect()) as con:
+            for key in REPORT_SHEETS:
+                lines = pd.read_sql_query(
+                    f"SELECT {', '.join(DEVIATION_COLUMNS)} FROM deviation_lines "
+                    f"WHERE offer_hash = ? AND del = ? AND invoice_hash IN ({placeholders}) ORDER BY rowid",
+                    con,
+                    params=(offer_hash, key, *file_hashes),
+                )
+                result[key] = lines.rename(columns=DEVIATION_COLUMNS)
+        return result
+
+    def reconciliation_totals(self, offer_hash):
+        """Løpende summer per varenummer for alle fakturaene som er sjekket mot tilbudet.
+
+        Samme tabell som :func:`sjekkfaktura.reconcile.add_totals` bygger, klar for
+        :func:`sjekkfaktura.reconcile.reconciliation_report`. Siste enhetspris er fra fakturaen
+        som ble behandlet sist.
+        """
+        sums = ", ".join(f"SUM(a.{column})" for column in list(ARTICLE_TOTAL_COLUMNS)[:4])
+        with closing(self._connect()) as con:
+            totals = pd.read_sql_query(
+                f"""
+                SELECT a.varenummer, {sums}, MIN(a.laveste_enhetspris), MAX(a.hoyeste_enhetspris), (
+                    SELECT b.siste_enhetspris FROM article_totals b JOIN invoices i ON i.hash = b.invoice_hash AND i.offer_hash = b.offer_hash
+                    WHERE b.offer_hash = a.offer_hash AND b.varenummer = a.varenummer AND b.siste_enhetspris IS NOT NULL
+                    ORDER BY i.behandlet DESC, b.rowid DESC LIMIT 1
+                )
+                FROM article_totals a WHERE a.offer_hash = ? GROUP BY a.varenummer
+                """,
+                con,
+                params=(offer_hash,),
+            )
+        totals.columns = ["Varenummer", *TOTAL_COLUMNS]
+        return totals.set_index("Varenummer").astype("float64")
+
+    def delete_invoice(self, file_hash, offer_hash):
+        with closing(self._connect()) as con, con:
+            con.execute("DELETE FROM invoices WHERE hash = ? AND offer_hash = ?", (file_hash, offer_hash))
+
+
+_default_results = None
+
+
+def default_results():
+    global _default_results
+    if _default_results is None:
+        _default_results = ResultStore()
+    return _default_results
@@ -0,0 +1,219 @@
+"""Tjeneste som følger med på en innboksmappe og sjekker nye fakturaer automatisk.
+
+Eksempel::
+
+    python -m sjekkfaktura.watch innboks/ tilbud.xlsx
+
+Nye PDF-er i mappen tolkes i en prosesspool med et fast antall prosesser (samme tolking
+som i appen, se :func:`sjekkfaktura.batch.parse_invoices`), sammenlignes mot tilbudet og
+lagres i resultatlageret (:mod:`sjekkfaktura.results`). Der kan Streamlit-appen hente
+avvikene med en gang uten å tolke PDF-ene på nytt.
+
+Filer med samme innhold som en fil som allerede er behandlet mot tilbudet, hoppes over. Det
+samme gjør fakturaer med et fakturanummer som allerede er lagret for tilbudet (f.eks. når
+samme faktura er eksportert fra e-posten to ganger); de registreres som duplikat. Filer som
+nettopp er endret, tas først ved neste runde, så vi ikke leser en fil som fortsatt skrives. Filer som
+feiler (f.eks. fordi en prosess i poolen døde), prøves igjen de neste rundene, opptil
+``MAX_ATTEMPTS`` ganger, og ellers når filen endres eller tjenesten startes på nytt.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+
+from .batch import parse_invoices
+from .catalog import DEFAULT_CATALOG_PATH, OfferCatalog
+from .cli import find_invoices, resolve_offer
+from .compare import compare_invoice_to_offer
+from .offer import OFFER_ENGINES
+from .parser import get_invoice_number
+from .pdf_backends import BACKENDS
+from .results import DEFAULT_RESULTS_PATH, DUPLICATE, ResultStore
+
+logger = logging.getLogger(__name__)
+
+# Så lenge må en fil ha vært uendret før den leses
+SETTLE_SECONDS = 2.0
+# Så mange ganger prøver vi en fil som feiler, før vi venter til den endres
+MAX_ATTEMPTS = 3
+
+
+class InboxWatcher:
+    """Sjekker nye fakturaer i ``inbox`` mot tilbudet ``offer_hash`` i katalogen og lagrer resultatet.
+
+    Hver runde (:meth:`poll`) tolker høyst ``batch_size`` filer om gangen, så minnebruken
+    holder seg nede selv når mange filer kommer samtidig.
+    """
+
+    def __init__(self, inbox, offer_hash, catalog, store, backend=None, max_workers=None,
+                 batch_size=None, settle_seconds=SETTLE_SECONDS):
+        self.inbox = inbox
+        self.offer_hash = offer_hash
+        self.catalog = catalog
+        self.store = store
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size or 4 * self.max_workers
+        self.settle_seconds = settle_seconds
+        # Størrelse og endringstid for filene som er sett, så uendrede filer ikke leses på nytt
+        self._seen = {}
+        # Antall mislykkede forsøk per filinnhold (hash), så en endret fil får nye forsøk
+        self._failures = {}
+
+    def new_files(self):
+        """PDF-ene i innboksen som er nye eller endret siden sist, og som har fått ligge i ro."""
+        now = time.time()
+        paths = []
+        for path in find_invoices(self.inbox):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime)
+            if self._seen.get(path) == signature or now - stat.st_mtime < self.settle_seconds:
+                continue
+            self._seen[path] = signature
+            paths.append(path)
+        return paths
+
+    def poll(self):
+        """Behandler nye filer i innboksen. Returnerer ``{filnavn: status}`` for filene som ble lagret."""
+        statuses = {}
+        paths = self.new_files()
+        for start in range(0, len(paths), self.batch_size):
+            statuses.update(self._process(paths[start:start + self.batch_size]))
+        return statuses
+
+    def _process(self, paths):
+        statuses = {}
+        batch = []
+        names = {}
+        paths_by_hash = {}
+        for path in paths:
+            name = os.path.basename(path)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                logger.warning("Kunne ikke lese %s: %s", path, e)
+                self._seen.pop(path, None)
+                continue
+            file_hash = hashlib.sha256(data).hexdigest()
+            if file_hash in names or self.store.has_file(file_hash, self.offer_hash):
+                logger.debug("%s er allerede behandlet", name)
+                continue
+
+            # Fakturanummeret står på første side, så dette er billig sammenlignet med hele tolkingen
+            try:
+                invoice_number = get_invoice_number(data, self.backend)
+            except Exception:
+                invoice_number = None
+            # Bare lagrede fakturaer regnes som original. Er det to filer med samme nummer i runden,
+            # tolkes begge og save_result lagrer den som blir ferdig sist, som duplikat. Slik blir
+            # den andre filen lagret hvis den ene feiler.
+            original = self.store.find_invoice(invoice_number, self.offer_hash) if invoice_number else None
+            if original is not None:
+                self.store.record_duplicate(file_hash, name, invoice_number, original, self.offer_hash)
+                statuses[name] = DUPLICATE
+                logger.info("%s: fakturanummer %s er allerede behandlet", name, invoice_number)
+                continue
+            names[file_hash] = name
+            paths_by_hash[file_hash] = path
+            batch.append((file_hash, data))
+
+        # Filene merkes med hashen, så like filnavn i undermapper eller over tid ikke blandes
+        for result in parse_invoices(batch, self.backend, self.max_workers):
+            file_hash = result["navn"]
+            name = names[file_hash]
+            comparison = None
+            if result["feil"] is None:
+                offer_data = self.catalog.offer_for_invoice(self.offer_hash, result["data"])
+                comparison = compare_invoice_to_offer(result["data"], offer_data)
+            statuses[name] = self.store.save_result(file_hash, name, result, comparison, self.offer_hash)
+            if result["feil"] is None:
+                logger.info(
+                    "%s: fakturanummer %s, %d linjer, %d avvik, %d kun i faktura (%s)",
+                    name, result["header"]["Fakturanummer"], len(result["data"]),
+                    len(comparison["avvik"]), len(comparison["kun_i_faktura"]), statuses[name],
+                )
+            else:
+                logger.warning("%s: %s", name, result["feil"])
+                self._retry(paths_by_hash[file_hash], file_hash)
+        return statuses
+
+    def _retry(self, path, file_hash):
+        """Glemmer at filen er sett, så den prøves igjen neste runde, til den har feilet ``MAX_ATTEMPTS`` ganger."""
+        attempts = self._failures.get(file_hash, 0) + 1
+        self._failures[file_hash] = attempts
+        if attempts < MAX_ATTEMPTS:
+            self._seen.pop(path, None)
+
+    def run(self, interval=5.0, stop=None):
+        """Går runde etter runde til ``stop`` (en :class:`threading.Event`) settes."""
+        stop = stop or threading.Event()
+        logger.info("Følger med på %s (%d prosesser)", self.inbox, self.max_workers)
+        while not stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                # Én feil runde skal ikke stoppe tjenesten; filene prøves igjen neste gang
+                logger.exception("Runden feilet")
+                self._seen.clear()
+            stop.wait(interval)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m sjekkfaktura.watch",
+        description="Følg med på en innboksmappe og sjekk nye fakturaer fra Brødrene Dahl mot et tilbud.",
+    )
+    parser.add_argument("innboks", help="mappen der fakturaene legges")
+    parser.add_argument("tilbud", help="tilbudet som Excel-fil (.xlsx), eller hashen (eller starten av den) til et lagret tilbud")
+    parser.add_argument("--intervall", type=float, default=5.0, help="sekunder mellom hver runde (standard: %(default)s)")
+    parser.add_argument("--en-gang", action="store_true", help="gå én runde og avslutt, f.eks. fra cron")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=None, help="PDF-motor (standard: pymupdf hvis installert)")
+    parser.add_argument("--excel-motor", choices=sorted(OFFER_ENGINES), default=None, help="motor for å lese tilbudet (standard: calamine hvis installert)")
+    parser.add_argument("--workers", type=int, default=None, help="antall prosesser (standard: antall kjerner)")
+    parser.add_argument("--katalog", default=DEFAULT_CATALOG_PATH, help="tilbudskatalogen (standard: %(default)s)")
+    parser.add_argument("--resultater", default=DEFAULT_RESULTS_PATH, help="resultatlageret (standard: %(default)s)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="vis også filer som hoppes over")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+
+    if not os.path.isdir(args.innboks):
+        print(f"Fant ikke mappen {args.innboks}", file=sys.stderr)
+        return 2
+
+    catalog = OfferCatalog(args.katalog)
+    try:
+        offer_hash = resolve_offer(catalog, args.tilbud, args.excel_motor)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 2
+    if not catalog.offer_info(offer_hash)["rader"]:
+        print("Kunne ikke lese tilbudsdata fra Excel-filen.", file=sys.stderr)
+        return 1
+
+    watcher = InboxWatcher(args.innboks, offer_hash, catalog, ResultStore(args.resultater), args.backend, args.workers)
+    if args.en_gang:
+        watcher.poll()
+        return 0
+    try:
+        watcher.run(args.intervall)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
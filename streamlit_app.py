@@ -1,200 +1,281 @@
-import streamlit as st
-import pdfplumber
+from functools import partial
+
 import pandas as pd
-import re
-from io import BytesIO
+import streamlit as st
+
+from sjekkfaktura.cache import cache_key, default_cache
+from sjekkfaktura.catalog import default_catalog
+from sjekkfaktura.export import EXPORT_FORMATS, report_bytes
+from sjekkfaktura.offer import available_offer_engines, default_offer_engine
+from sjekkfaktura.pdf_backends import available_backends
+from sjekkfaktura.profiling import Profiler, enable_json_log
+from sjekkfaktura.progressive import CANCELLED, DONE, FAILED, ProgressiveCheck
+from sjekkfaktura.reconcile import reconciliation_report
+from sjekkfaktura.results import OK, default_results
 
 st.set_page_config(page_title="Sammenlign Faktura mot Tilbud", layout="wide", initial_sidebar_state="expanded")
 
-# Funksjon for å lese fakturanummer fra PDF
-def get_invoice_number(file):
-    try:
-        with pdfplumber.open(file) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                match = re.search(r"Fakturanummer\s*[:\-]?\s*(\d+)", text, re.IGNORECASE)
-                if match:
-                    return match.group(1)
-        return None
-    except Exception as e:
-        st.error(f"Kunne ikke lese fakturanummer fra PDF: {e}")
-        return None
-
-# Funksjon for å lese PDF-filen og hente ut relevante data
-def extract_data_from_pdf(file, doc_type, invoice_number=None):
-    try:
-        with pdfplumber.open(file) as pdf:
-            data = []
-            start_reading = False
-
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text is None:
-                    st.error(f"Ingen tekst funnet på side {page.page_number} i PDF-filen.")
-                    continue
-                
-                lines = text.split('\n')
-                for line in lines:
-                    if doc_type == "Faktura" and "Artikkel" in line:
-                        start_reading = True
-                        continue
-
-                    if start_reading:
-                        columns = line.split()
-                        if len(columns) >= 5:
-                            item_number = columns[1]
-                            if not item_number.isdigit():
-                                continue
-
-                            description = " ".join(columns[2:-4])
-                            try:
-                                antall_fra_beskrivelse = re.search(r'(\d+)\s*$', description)
-                                if antall_fra_beskrivelse:
-                                    quantity = float(antall_fra_beskrivelse.group(1).replace('.', '').replace(',', '.'))
-                                    description = re.sub(r'\s*\d+\s*$', '', description)
-                                else:
-                                    quantity = float(columns[-4].replace('.', '').replace(',', '.')) if columns[-4].replace('.', '').replace(',', '').isdigit() else columns[-4]
-                                
-                                unit_price = float(columns[-3].replace('.', '').replace(',', '.')) if columns[-3].replace('.', '').replace(',', '').isdigit() else columns[-3]
-                                discount = float(columns[-2].replace('.', '').replace(',', '.')) if columns[-2].replace('.', '').replace(',', '').isdigit() else 0  # Sett rabatt til 0 hvis tom
-                                total_price = float(columns[-1].replace('.', '').replace(',', '.')) if columns[-1].replace('.', '').replace(',', '').isdigit() else columns[-1]
-                            except ValueError as e:
-                                st.error(f"Kunne ikke konvertere til flyttall: {e}")
-                                continue
-
-                            unique_id = f"{invoice_number}_{item_number}" if invoice_number else item_number
-                            data.append({
-                                "UnikID": unique_id,
-                                "Varenummer": item_number,
-                                "Beskrivelse_Faktura": description,
-                                "Antall_Faktura": quantity,
-                                "Enhetspris_Faktura": unit_price,
-                                "Rabatt": discount,
-                                "Beløp_Faktura": total_price,
-                                "Type": doc_type
-                            })
-            if len(data) == 0:
-                st.error("Ingen data ble funnet i PDF-filen.")
-                
-            return pd.DataFrame(data)
-    except Exception as e:
-        st.error(f"Kunne ikke lese data fra PDF: {e}")
-        return pd.DataFrame()
-
-
-# Funksjon for å konvertere DataFrame til en Excel-fil
-def convert_df_to_excel(df):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Sheet1')
-    return output.getvalue()
+# Målingene for hvert steg skrives som JSON-linjer til stderr, så de kan samles opp fra alle brukere
+enable_json_log()
 
 # Hovedfunksjon for Streamlit-appen
 def main():
     st.title("Sammenlign Faktura mot Tilbud")
     st.markdown("""<style>.dataframe th {font-weight: bold !important;}</style>""", unsafe_allow_html=True)
 
+    with st.sidebar:
+        backend = st.selectbox("PDF-motor", available_backends(), help="PyMuPDF er raskest; pdfplumber kan brukes som kontroll.")
+        engines = available_offer_engines()
+        offer_engine = st.selectbox("Excel-motor", engines, index=engines.index(default_offer_engine()), help="calamine er raskest når python-calamine er installert.")
+
+        st.subheader("Hurtigbuffer")
+        stats = default_cache().stats
+        st.caption(f"Treff i minnet: {stats['minne_treff']} · Treff på disk: {stats['disk_treff']} · Bom: {stats['bom']}")
+        if st.button("Tøm hurtigbuffer"):
+            default_cache().clear()
+            st.success("Hurtigbufferen er tømt.")
+
+        show_diagnostics = st.checkbox("Vis diagnostikk", help="Tid, sider, rader og minnebruk for hvert steg.")
+        diagnostics = st.container()
+
+    profiler = Profiler(trace_memory=show_diagnostics, pdf_motor=backend, excel_motor=offer_engine)
+
     # Opprett tre kolonner
     col1, col2, col3 = st.columns([1, 5, 1])
 
     with col1:
         st.header("Last opp filer")
-        invoice_file = st.file_uploader("Last opp faktura fra Brødrene Dahl", type="pdf")
-        offer_file = st.file_uploader("Last opp tilbud fra Brødrene Dahl (Excel)", type="xlsx")
-
-    if invoice_file and offer_file:
-        # Hent fakturanummer
-        with col1:
-            st.info("Henter fakturanummer fra faktura...")
-            invoice_number = get_invoice_number(invoice_file)
-
-        if invoice_number:
-            with col1:
-                st.success(f"Fakturanummer funnet: {invoice_number}")
-            
-            # Ekstraher data fra PDF-filer
-            with col1:
-                st.info("Laster inn faktura...")
-            invoice_data = extract_data_from_pdf(invoice_file, "Faktura", invoice_number)
-
-            # Les tilbudet fra Excel-filen
-            with col1:
-                st.info("Laster inn tilbud fra Excel-filen...")
-            offer_data = pd.read_excel(offer_file)
-
-            # Riktige kolonnenavn fra Excel-filen for tilbud
-            offer_data.rename(columns={
-                'VARENR': 'Varenummer',
-                'BESKRIVELSE': 'Beskrivelse_Tilbud',
-                'ANTALL': 'Antall_Tilbud',
-                'ENHET': 'Enhet_Tilbud',
-                'ENHETSPRIS': 'Enhetspris_Tilbud',
-                'TOTALPRIS': 'Totalt pris'
-            }, inplace=True)
-
-            # Sammenligne faktura mot tilbud
-            if not invoice_data.empty and not offer_data.empty:
-                with col2:
-                    st.write("Sammenligner data...")
-                
-                # Merge faktura- og tilbudsdataene
-                merged_data = pd.merge(offer_data, invoice_data, on="Varenummer", how='outer', suffixes=('_Tilbud', '_Faktura'))
-
-                # Konverter kolonner til numerisk der det er relevant
-                merged_data["Antall_Faktura"] = pd.to_numeric(merged_data["Antall_Faktura"], errors='coerce')
-                merged_data["Antall_Tilbud"] = pd.to_numeric(merged_data["Antall_Tilbud"], errors='coerce')
-                merged_data["Enhetspris_Faktura"] = pd.to_numeric(merged_data["Enhetspris_Faktura"], errors='coerce')
-                merged_data["Enhetspris_Tilbud"] = pd.to_numeric(merged_data["Enhetspris_Tilbud"], errors='coerce')
-
-                # Etter at vi har samlet dataene og opprettet merged_data, kan vi legge til en sjekk for å flytte verdiene
-                merged_data["Enhetspris_Faktura"] = merged_data.apply(
-                    lambda row: row["Rabatt"] if pd.isna(row["Enhetspris_Faktura"]) and not pd.isna(row["Rabatt"]) else row["Enhetspris_Faktura"],
-                    axis=1
-                )
-
-                # Fjern verdiene fra rabattkolonnen der de er flyttet
-                merged_data["Rabatt"] = merged_data.apply(
-                    lambda row: None if row["Enhetspris_Faktura"] == row["Rabatt"] else row["Rabatt"],
-                    axis=1
-                )
-
-                # Finne avvik
-                merged_data["Avvik_Antall"] = merged_data["Antall_Faktura"] - merged_data["Antall_Tilbud"]
-                merged_data["Avvik_Enhetspris"] = merged_data["Enhetspris_Faktura"] - merged_data["Enhetspris_Tilbud"]
-                merged_data["Prosentvis_økning"] = ((merged_data["Enhetspris_Faktura"] - merged_data["Enhetspris_Tilbud"]) / merged_data["Enhetspris_Tilbud"]) * 100
-
-                # Filtrer avvik
-                avvik = merged_data[(merged_data["Avvik_Antall"].notna() & (merged_data["Avvik_Antall"] != 0)) |
-                                    (merged_data["Avvik_Enhetspris"].notna() & (merged_data["Avvik_Enhetspris"] != 0))]
-
-                with col2:
-                    st.subheader("Avvik mellom Faktura og Tilbud")
-                    st.dataframe(avvik)
-
-                # Artikler som finnes i faktura, men ikke i tilbud
-                only_in_invoice = merged_data[merged_data['Enhetspris_Tilbud'].isna()]
-                with col2:
-                    st.subheader("Varenummer som finnes i faktura, men ikke i tilbud")
-                    st.dataframe(only_in_invoice)
-
-                # Kombiner avvik og only_in_invoice til én DataFrame
-                combined_data = pd.concat([avvik, only_in_invoice])
-
-                # Lagre kun artikkeldataene til XLSX
-                excel_data = convert_df_to_excel(combined_data)
-                # Nedlastingsknapp for å laste ned hele den kombinerte tabellen
-                with col3:
-                    st.download_button(
-                        label="Last ned alle varenummer og avvik som Excel",
-                        data=excel_data,
-                        file_name="alle_varer_og_avvik.xlsx",
-                        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                    )
+        invoice_source = st.radio("Fakturaer", ["Last opp", "Fra innboksen"], horizontal=True, help="Fakturaene i innboksen er allerede sjekket av innboks-tjenesten (python -m sjekkfaktura.watch).")
+        invoice_files = None
+        if invoice_source == "Last opp":
+            invoice_files = st.file_uploader("Last opp fakturaer fra Brødrene Dahl", type="pdf", accept_multiple_files=True)
+
+        # Tilbud importeres én gang til katalogen og kan senere velges uten ny opplasting
+        catalog = default_catalog()
+        stored_offers = catalog.list_offers()
+        offer_hash = None
+        offer_source = "Last opp nytt tilbud"
+        if not stored_offers.empty:
+            offer_source = st.radio("Tilbud", ["Last opp nytt tilbud", "Velg lagret tilbud"], horizontal=True)
 
+        if offer_source == "Velg lagret tilbud":
+            labels = {row.hash: f"{row.navn} ({row.importert}, {row.rader} linjer)" for row in stored_offers.itertuples()}
+            offer_hash = st.selectbox("Lagret tilbud", list(labels), format_func=labels.get)
+        else:
+            offer_file = st.file_uploader("Last opp tilbud fra Brødrene Dahl (Excel)", type="xlsx")
+            if offer_file:
+                catalog.last_import = None
+                try:
+                    with st.spinner("Importerer tilbud fra Excel-filen..."), profiler.stage("tilbud_import") as record:
+                        offer_hash = catalog.import_offer(offer_file.getvalue(), offer_file.name, offer_engine)
+                        record["rader"] = catalog.last_import["rader"] if catalog.last_import else 0
+                        record["fra_katalog"] = catalog.last_import is None
+                except ValueError as e:
+                    st.error(f"Kunne ikke lese tilbudsdata fra Excel-filen: {e}")
+                if catalog.last_import:
+                    stats = catalog.last_import
+                    st.caption(f"Leste {stats['rader']} tilbudsrader med {stats['motor']} på {stats['sekunder']:.2f} s ({stats['rader_per_sekund']:,.0f} rader/s)")
+
+    if invoice_source == "Fra innboksen" and offer_hash:
+        show_inbox(offer_hash, profiler, col1, col2, col3)
+
+    elif invoice_files and offer_hash:
+        cache = default_cache()
+
+        # Resultatet bufres på innholdet i hver fil, så reruns og gjenopplastinger slipper ny tolking
+        finished = []
+        to_parse = []
+        names = {}
+        for invoice_file in invoice_files:
+            key = cache_key(invoice_file.getvalue(), f"faktura-{backend}")
+            # Samme fil lastet opp to ganger skal ikke gi doble rader
+            if key in names:
+                continue
+            names[key] = invoice_file.name
+            cached = cache.get(key)
+            if cached is not None:
+                finished.append({"navn": key, "header": cached[1], "data": cached[0], "feil": None})
             else:
-                st.error("Kunne ikke lese tilbudsdata fra Excel-filen.")
+                to_parse.append((key, invoice_file.getvalue()))
+
+        if not catalog.offer_info(offer_hash)["rader"]:
+            st.error("Kunne ikke lese tilbudsdata fra Excel-filen.")
         else:
-            st.error("Fakturanummeret ble ikke funnet i PDF-filen.")
+            # Tolkingen kjører i bakgrunnen og lever videre i økten, så klikk i appen (f.eks. på
+            # nedlastingsknappen) ikke starter den på nytt. Nye filer eller et annet tilbud gir ny kjøring.
+            # Filene merkes med buffernøkkelen, så like filnavn ikke blandes sammen.
+            job_key = (tuple(sorted(names)), offer_hash, backend)
+            job = st.session_state.get("fakturasjekk")
+            if job is None or job["nøkkel"] != job_key:
+                if job is not None:
+                    job["jobb"].cancel()
+                job = {"nøkkel": job_key, "jobb": ProgressiveCheck(
+                    to_parse,
+                    partial(catalog.offer_for_invoice, offer_hash),
+                    finished=finished,
+                    backend=backend,
+                    on_result=partial(cache_result, cache),
+                    profiler=Profiler(pdf_motor=backend, excel_motor=offer_engine),
+                )}
+                st.session_state["fakturasjekk"] = job
+            check = job["jobb"]
+
+            with col2:
+                st.fragment(show_results, run_every=1.0 if check.running else None)(check, names, live=check.running)
+
+            if not check.running:
+                result = check.result()
+                if check.status == DONE and not any(r["feil"] is None for r in check.results):
+                    st.error("Ingen av fakturaene kunne leses.")
+                elif result is not None:
+                    with col3:
+                        show_report(result, (job_key, check.status), profiler)
+
+    if show_diagnostics:
+        with diagnostics:
+            show_profile(profiler)
+            job = st.session_state.get("fakturasjekk")
+            if job is not None:
+                st.caption("Tolking og sammenligning i bakgrunnen")
+                show_profile(job["jobb"].profiler)
+
+# Rapporten lages først når brukeren ber om den, ikke på hver rerun.
+# Den lagres i økten sammen med et fingeravtrykk av inndataene.
+def show_report(result, inputs, profiler):
+    fmt = st.selectbox("Format", list(EXPORT_FORMATS), format_func=str.upper)
+    fingerprint = (inputs, fmt)
+    report = st.session_state.get("rapport")
+    if st.button("Lag rapport"):
+        with st.spinner("Lager rapport..."), profiler.stage("eksport", format=fmt) as record:
+            report = {"nøkkel": fingerprint, "data": report_bytes(result, fmt)}
+            record["rader"] = len(result["avvik"]) + len(result["kun_i_faktura"])
+            record["bytes"] = len(report["data"])
+        st.session_state["rapport"] = report
+    if report is not None and report["nøkkel"] == fingerprint:
+        st.download_button(
+            label="Last ned alle varenummer og avvik",
+            data=report["data"],
+            file_name=f"alle_varer_og_avvik.{fmt}",
+            mime=EXPORT_FORMATS[fmt][1]
+        )
+
+# Fakturaer som innboks-tjenesten allerede har sjekket mot tilbudet, hentes fra resultatlageret
+def show_inbox(offer_hash, profiler, col1, col2, col3):
+    store = default_results()
+    invoices = store.list_invoices(offer_hash)
+    with col1:
+        if invoices.empty:
+            st.info("Ingen fakturaer fra innboksen er sjekket mot dette tilbudet ennå.")
+            return
+        checked = invoices[invoices["status"] == OK]
+        labels = {row.hash: f"{row.fakturanummer} – {row.navn} ({row.behandlet})" for row in checked.itertuples()}
+        selected = st.multiselect("Fakturaer fra innboksen", list(labels), default=list(labels), format_func=labels.get)
+        skipped = invoices[invoices["status"] != OK]
+        if not skipped.empty:
+            with st.expander(f"Hoppet over ({len(skipped)})"):
+                st.dataframe(skipped[["navn", "status", "fakturanummer", "duplikat_av", "feil", "behandlet"]])
+    if not selected:
+        return
+
+    with profiler.stage("innboks_oppslag", filer=len(selected)) as record:
+        result = store.load_deviations(offer_hash, selected)
+        record["rader"] = len(result["avvik"]) + len(result["kun_i_faktura"])
+
+    with col2:
+        st.subheader("Avvik mellom Faktura og Tilbud")
+        st.dataframe(result["avvik"])
+        st.subheader("Varenummer som finnes i faktura, men ikke i tilbud")
+        st.dataframe(result["kun_i_faktura"])
+
+        # Avstemmingen gjelder alle fakturaene som er sjekket mot tilbudet, ikke bare de valgte
+        with profiler.stage("avstemming") as record:
+            totals = store.reconciliation_totals(offer_hash)
+            offer_data = default_catalog().lookup(offer_hash, totals.index)
+            reconciliation = reconciliation_report(totals, offer_data)
+            record["varenumre"] = len(reconciliation)
+        show_reconciliation(reconciliation)
+
+    with col3:
+        show_report(result, (tuple(sorted(selected)), offer_hash), profiler)
+
+# Lagrer ferdig tolkede fakturaer i hurtigbufferen. Kalles fra bakgrunnstråden.
+def cache_result(cache, result):
+    if result["feil"] is None:
+        cache.put(result["navn"], result["data"], result["header"])
+
+# Fremdrift, status for filene som er ferdige og avvikene som er funnet så langt. Kjøres som
+# et fragment som oppdateres hvert sekund mens tolkingen pågår, uten å kjøre resten av appen på nytt.
+def show_results(check, names, live):
+    if check.running:
+        st.progress(check.progress, text=f"Leser side {check.pages_done} av {check.pages_total or '?'}...")
+        if st.button("Avbryt"):
+            check.cancel()
+    elif live:
+        # Tolkingen ble ferdig mens fragmentet kjørte; kjør hele appen så rapporten kan lages
+        st.rerun()
+    elif check.status == CANCELLED:
+        st.warning("Tolkingen ble avbrutt. Avvikene under gjelder bare sidene som ble lest.")
+        if st.button("Start tolkingen på nytt"):
+            del st.session_state["fakturasjekk"]
+            st.rerun()
+    elif check.status == FAILED:
+        st.error(f"Tolkingen feilet: {check.error}")
+
+    show_file_status(check, names)
+
+    result = check.result()
+    if result is None:
+        if check.running:
+            st.caption("Venter på de første sidene...")
+        return
+
+    st.subheader("Avvik mellom Faktura og Tilbud")
+    st.dataframe(result["avvik"])
+
+    # Artikler som finnes i faktura, men ikke i tilbud
+    st.subheader("Varenummer som finnes i faktura, men ikke i tilbud")
+    st.dataframe(result["kun_i_faktura"])
+
+    reconciliation = check.reconciliation()
+    if reconciliation is not None:
+        show_reconciliation(reconciliation)
+
+# Summert antall og beløp per varenummer over alle fakturaene, mot det som er tilbudt
+def show_reconciliation(reconciliation):
+    st.subheader("Avstemming mot tilbudet")
+    if reconciliation.empty:
+        st.caption("Ingen fakturalinjer å avstemme ennå.")
+        return
+    overbilled = reconciliation[(reconciliation["Overfakturert_Antall"] > 0) | (reconciliation["Overfakturert_Beløp"] > 0)]
+    if not overbilled.empty:
+        st.warning(
+            f"{len(overbilled)} varenummer er fakturert ut over tilbudet, "
+            f"til sammen {overbilled['Overfakturert_Beløp'].sum():,.2f} kr for mye."
+        )
+    st.dataframe(reconciliation)
+
+# Status for hver fil etter hvert som filene blir ferdige
+def show_file_status(check, names):
+    # Listen fylles fra bakgrunnstråden, så vi går gjennom en kopi
+    for result in list(check.results):
+        name = names.get(result["navn"], result["navn"])
+        if result["feil"] is None:
+            st.success(f"{name}: fakturanummer {result['header']['Fakturanummer']}, {len(result['data'])} linjer")
+        else:
+            st.error(f"{name}: {result['feil']}")
+
+# Viser målingene fra denne kjøringen i sidepanelet
+def show_profile(profiler):
+    if not profiler.stages:
+        st.caption("Ingen steg er målt i denne kjøringen.")
+        return
+    summary = profiler.summary()
+    st.caption(f"Kjøring {summary['kjøring']}: {summary['sekunder']:.2f} s totalt")
+    st.dataframe(pd.DataFrame(profiler.stages).set_index("steg"))
+    if profiler.page_times:
+        st.caption("Uttrekkstid per side (sekunder)")
+        pages = pd.DataFrame(profiler.page_times)
+        st.bar_chart(pages.assign(side=pages["fil"] + " s." + pages["side"].astype(str)).set_index("side")["sekunder"])
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Testene kjøres fra roten av repoet uten at pakken er installert
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,153 @@
+"""Lager eksempelfakturaene i denne mappen.
+
+Fakturaene er laget med ReportLab, ikke PyMuPDF, så testen av motorene ikke bare leser
+PDF-er som den ene motoren selv har skrevet. Oppsettet følger fakturaene fra Brødrene Dahl:
+et hode med fakturaopplysninger i to kolonner, en artikkeltabell der hver kolonne er
+plassert for seg (tall høyrejustert), sidetall og delsum nederst, overskriften gjentatt på
+hver side og sider med betingelser til slutt. Kreditlinjer har negative tall. Noen
+fakturaer gjentar ikke overskriften på de siste sidene; ``faktura_fortsettelse.pdf`` har en
+slik side.
+
+PDF-ene er sjekket inn; skriptet trengs bare for å lage dem på nytt::
+
+    pip install reportlab
+    python tests/samples/make_samples.py
+"""
+
+import os
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Venstre kant for tekstkolonnene og høyre kant for tallkolonnene
+COLUMNS = [
+    ("Linje", 40, "left"),
+    ("Artikkel", 75, "left"),
+    ("Beskrivelse", 135, "left"),
+    ("Antall", 365, "right"),
+    ("Enhetspris", 435, "right"),
+    ("Rabatt", 485, "right"),
+    ("Beløp", 555, "right"),
+]
+
+TERMS = [
+    "Betaling skal skje innen forfallsdato. Ved forsinket betaling beregnes forsinkelsesrente.",
+    "Reklamasjon må meldes skriftlig straks feil eller mangler oppdages.",
+    "Varene forblir selgers eiendom til kjøpesummen er betalt.",
+    "Retur av varer skal avtales på forhånd. Spesialbestilte varer tas ikke i retur.",
+]
+
+# (varenummer, beskrivelse, antall, enhetspris, rabatt, beløp); tekst skrives som den står
+SIMPLE = [
+    ("1012345", "Rør PP grå 110mm", "12", "245,50", "0,00", "2.946,00"),
+    ("1012346", "Bend PP 45gr 110mm", "4", "89,90", "10,00", "323,64"),
+    ("1012347", "Kobberrør hardt 15mm", "25", "1.234,50", "25,00", "23.146,88"),
+    ("1012348", "Pressmuffe kobber 22mm", "100", "18,40", "0,00", "1.840,00"),
+    ("1012349", "Kuleventil DN20 messing", "2", "412,00", "0,00", "824,00"),
+    ("1012351", "Gulvsluk plast", "1", "1.899,00", "15,00", "1.614,15"),
+    ("1012352", "Rørklammer M8 galv", "50", "7,25", "0,00", "362,50"),
+    ("1012353", "Koblingsboks rør-i-rør", "3", "149,00", "-", "447,00"),
+    ("1012354", "Frakt", "1", "350,00", "0,00", "350,00"),
+    ("1012345", "Retur rør PP grå 110mm", "-2", "245,50", "0,00", "-491,00"),
+]
+
+CREDIT_NOTE = [
+    ("1012345", "Retur rør PP grå 110mm", "-4", "245,50", "0,00", "-982,00"),
+    ("1012347", "Kreditnota kobberrør hardt 15mm", "-10", "1.234,50", "25,00", "-9.258,75"),
+    ("1012354", "Kreditert frakt", "1", "-350,00", "0,00", "-350,00"),
+    ("1012360", "Returgebyr", "1", "125,00", "-", "125,00"),
+]
+
+DESCRIPTIONS = ["Rør PP grå 110mm", "Bend PP 45gr 110mm", "Isolasjon rørskål", "Rørklammer M8 galv", "Gulvsluk plast"]
+
+
+def norwegian(value):
+    text = f"{value:,.2f}"
+    return text.replace(",", " ").replace(".", ",").replace(" ", ".")
+
+
+def long_invoice_lines(count):
+    lines = []
+    for index in range(count):
+        quantity = (index * 7) % 40 + 1
+        unit_price = 10 + (index * 37.5) % 2000
+        discount = (0, 10, 25)[index % 3]
+        amount = round(quantity * unit_price * (1 - discount / 100), 2)
+        lines.append((str(1020000 + index), DESCRIPTIONS[index % len(DESCRIPTIONS)], str(quantity), norwegian(unit_price), norwegian(discount), norwegian(amount)))
+    return lines
+
+
+def draw_header(pdf, invoice_number, title):
+    pdf.setFont("Helvetica-Bold", 14)
+    pdf.drawString(40, 800, "Brødrene Dahl AS")
+    pdf.setFont("Helvetica", 9)
+    pdf.drawString(40, 785, "Postboks 6003 Etterstad, 0601 Oslo")
+    pdf.drawString(40, 773, "Kunde: Rørlegger Hansen AS")
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawString(360, 800, title)
+    pdf.setFont("Helvetica", 9)
+    for y, text in ((785, f"Fakturanummer: {invoice_number}"), (773, "Fakturadato: 15.10.2026"), (761, "Kundenummer: 123456"), (749, "Ordrenummer: 7654321")):
+        pdf.drawString(360, y, text)
+
+
+def draw_row(pdf, y, values, font="Helvetica", size=8):
+    pdf.setFont(font, size)
+    for value, (_, x, align) in zip(values, COLUMNS):
+        if align == "right":
+            pdf.drawRightString(x, y, value)
+        else:
+            pdf.drawString(x, y, value)
+
+
+def write_invoice(path, invoice_number, lines, lines_per_page=40, terms_pages=0, title="FAKTURA", header_pages=None):
+    pdf = canvas.Canvas(path, pagesize=A4)
+    table_pages = max(1, -(-len(lines) // lines_per_page))
+    pages = table_pages + terms_pages
+    for page_index in range(table_pages):
+        if page_index == 0:
+            draw_header(pdf, invoice_number, title)
+            y = 715
+        else:
+            pdf.setFont("Helvetica", 9)
+            pdf.drawString(40, 800, f"Fakturanummer: {invoice_number} (forts.)")
+            y = 775
+        # Sidene etter ``header_pages`` fortsetter tabellen uten overskrift
+        if header_pages is None or page_index < header_pages:
+            draw_row(pdf, y, [name for name, _, _ in COLUMNS], "Helvetica-Bold", 9)
+            pdf.line(40, y - 4, 555, y - 4)
+            y -= 16
+        chunk = lines[page_index * lines_per_page:(page_index + 1) * lines_per_page]
+        for number, line in enumerate(chunk, start=page_index * lines_per_page + 1):
+            draw_row(pdf, y, [str(number), *line])
+            y -= 15
+        pdf.setFont("Helvetica", 8)
+        if page_index == table_pages - 1:
+            pdf.drawString(300, y - 10, "Sum eks. mva")
+            pdf.drawRightString(555, y - 10, "se vedlegg")
+        pdf.drawString(40, 30, f"Side {page_index + 1} av {pages}")
+        pdf.showPage()
+    for page_index in range(table_pages, pages):
+        pdf.setFont("Helvetica-Bold", 11)
+        pdf.drawString(40, 800, "Salgs- og leveringsbetingelser")
+        pdf.setFont("Helvetica", 7)
+        y = 780
+        for paragraph in range(50):
+            pdf.drawString(40, y, f"{paragraph + 1}. {TERMS[paragraph % len(TERMS)]}")
+            y -= 14
+        pdf.setFont("Helvetica", 8)
+        pdf.drawString(40, 30, f"Side {page_index + 1} av {pages}")
+        pdf.showPage()
+    pdf.save()
+
+
+def main():
+    write_invoice(os.path.join(HERE, "faktura_enkel.pdf"), "90000101", SIMPLE)
+    write_invoice(os.path.join(HERE, "faktura_flere_sider.pdf"), "90000102", long_invoice_lines(110), terms_pages=2)
+    write_invoice(os.path.join(HERE, "kreditnota.pdf"), "90000103", CREDIT_NOTE, title="KREDITNOTA")
+    write_invoice(os.path.join(HERE, "faktura_fortsettelse.pdf"), "90000104", long_invoice_lines(15), lines_per_page=5, header_pages=2)
+
+
+if __name__ == "__main__":
+    main()
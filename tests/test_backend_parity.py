@@ -0,0 +1,49 @@
+"""PyMuPDF og pdfplumber skal gi de samme artikkellinjene for eksempelfakturaene.
+
+Eksempelfakturaene i ``tests/samples`` er laget med ReportLab (se ``make_samples.py``),
+med kolonnene plassert hver for seg slik som på fakturaene fra Brødrene Dahl.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("fitz")
+pytest.importorskip("pdfplumber")
+
+from sjekkfaktura.parser import extract_data_from_pdf  # noqa: E402
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+
+# Eksempelfaktura og antall artikkellinjer den har
+EXPECTED_ROWS = {
+    "faktura_enkel.pdf": 10,
+    "faktura_flere_sider.pdf": 110,
+    "kreditnota.pdf": 4,
+    # Tre sider der bare de to første har overskrift over tabellen
+    "faktura_fortsettelse.pdf": 15,
+}
+
+COLUMNS = ["UnikID", "Varenummer", "Beskrivelse_Faktura", "Antall_Faktura", "Enhetspris_Faktura", "Rabatt", "Beløp_Faktura"]
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED_ROWS))
+def test_backends_give_identical_rows(name):
+    path = os.path.join(SAMPLES, name)
+    pymupdf = extract_data_from_pdf(path, backend="pymupdf")
+    pdfplumber = extract_data_from_pdf(path, backend="pdfplumber")
+
+    assert len(pymupdf) == EXPECTED_ROWS[name]
+    assert pymupdf[COLUMNS].to_dict("records") == pdfplumber[COLUMNS].to_dict("records")
+
+
+def test_invoice_number_in_unique_ids():
+    rows = extract_data_from_pdf(os.path.join(SAMPLES, "faktura_enkel.pdf"), backend="pdfplumber")
+    assert rows["UnikID"].str.startswith("90000101_").all()
+
+
+@pytest.mark.parametrize("backend", ["pymupdf", "pdfplumber"])
+def test_continuation_page_without_header(backend):
+    rows = extract_data_from_pdf(os.path.join(SAMPLES, "faktura_fortsettelse.pdf"), backend=backend)
+    # Linjene på side 3, som ikke har overskrift, skal være med
+    assert rows["Varenummer"].tolist()[-5:] == [str(1020000 + index) for index in range(10, 15)]
@@ -0,0 +1,33 @@
+"""Hurtigbufferen skal gi tilbake nøyaktig det som ble lagret, også fra disk."""
+
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("fitz")
+
+from sjekkfaktura.cache import DataFrameCache, cache_key  # noqa: E402
+from sjekkfaktura.parser import extract_data_from_pdf  # noqa: E402
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+
+
+@pytest.mark.parametrize("name", ["kreditnota.pdf", "faktura_enkel.pdf"])
+def test_round_trip_from_disk(tmp_path, name):
+    path = os.path.join(SAMPLES, name)
+    with open(path, "rb") as f:
+        key = cache_key(f.read(), "faktura-pymupdf")
+    # Kreditlinjene gir kolonner med både tall og tekst som «-982,00»
+    data = extract_data_from_pdf(path, backend="pymupdf")
+    header = {"Fakturanummer": data["UnikID"].iloc[0].split("_")[0]}
+
+    DataFrameCache(str(tmp_path)).put(key, data, header)
+    # En ny buffer har tomt minnelag, så oppføringen må leses fra disk
+    cache = DataFrameCache(str(tmp_path))
+    cached, meta = cache.get(key)
+
+    assert cache.stats["disk_treff"] == 1
+    assert meta == header
+    assert cached.equals(data)
+    assert [list(map(type, cached[column])) for column in cached] == [list(map(type, data[column])) for column in data]
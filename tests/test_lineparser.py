@@ -0,0 +1,88 @@
+"""Kolonnetolkeren skal gi nøyaktig de samme radene som den opprinnelige radvise tolkeren.
+
+Fasiten er den radvise tolkeren som tidligere lå i ``sjekkfaktura.parser``
+(:func:`parse_article_line`). Linjene er hentet fra ``benchmarks/line_samples.txt``, som
+også har kreditlinjer med negative tall. ``benchmarks/bench_lineparser.py`` bruker den
+samme tolkeren for å måle linjer per sekund.
+"""
+
+import logging
+import os
+import re
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from sjekkfaktura.lineparser import ArticleRows  # noqa: E402
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "line_samples.txt")
+
+logger = logging.getLogger(__name__)
+
+
+def parse_article_line(line, doc_type):
+    """Tolker én artikkellinje. Returnerer None hvis linjen ikke er en artikkel."""
+    columns = line.split()
+    if len(columns) < 5:
+        return None
+    item_number = columns[1]
+    if not item_number.isdigit():
+        return None
+
+    description = " ".join(columns[2:-4])
+    try:
+        antall_fra_beskrivelse = re.search(r'(\d+)\s*$', description)
+        if antall_fra_beskrivelse:
+            quantity = float(antall_fra_beskrivelse.group(1).replace('.', '').replace(',', '.'))
+            description = re.sub(r'\s*\d+\s*$', '', description)
+        else:
+            quantity = float(columns[-4].replace('.', '').replace(',', '.')) if columns[-4].replace('.', '').replace(',', '').isdigit() else columns[-4]
+
+        unit_price = float(columns[-3].replace('.', '').replace(',', '.')) if columns[-3].replace('.', '').replace(',', '').isdigit() else columns[-3]
+        discount = float(columns[-2].replace('.', '').replace(',', '.')) if columns[-2].replace('.', '').replace(',', '').isdigit() else 0  # Sett rabatt til 0 hvis tom
+        total_price = float(columns[-1].replace('.', '').replace(',', '.')) if columns[-1].replace('.', '').replace(',', '').isdigit() else columns[-1]
+    except ValueError as e:
+        logger.warning("Kunne ikke konvertere til flyttall: %s", e)
+        return None
+
+    return {
+        "UnikID": item_number,
+        "Varenummer": item_number,
+        "Beskrivelse_Faktura": description,
+        "Antall_Faktura": quantity,
+        "Enhetspris_Faktura": unit_price,
+        "Rabatt": discount,
+        "Beløp_Faktura": total_price,
+        "Type": doc_type
+    }
+
+
+def reference_rows(lines, doc_type, invoice_number=None):
+    rows = []
+    for line in lines:
+        row = parse_article_line(line, doc_type)
+        if row is not None:
+            if invoice_number is not None:
+                row["UnikID"] = f"{invoice_number}_{row['Varenummer']}"
+            rows.append(row)
+    return rows
+
+
+def columnar_rows(lines, doc_type, invoice_number=None):
+    rows = ArticleRows(doc_type, invoice_number)
+    for line in lines:
+        rows.add_line(line)
+    return rows
+
+
+def sample_lines():
+    with open(SAMPLES, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+@pytest.mark.parametrize("invoice_number", [None, "90000001"], ids=["uten_nummer", "med_nummer"])
+@pytest.mark.parametrize("line", sample_lines())
+def test_same_rows_as_row_wise_parser(line, invoice_number):
+    expected = reference_rows([line], "Faktura", invoice_number)
+    assert columnar_rows([line], "Faktura", invoice_number).to_dicts() == expected
@@ -0,0 +1,63 @@
+"""Avstemming av flere delfakturaer mot et tilbud, med tall regnet ut for hånd."""
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from sjekkfaktura.reconcile import add_totals, aggregate_invoice, reconciliation_report  # noqa: E402
+
+# Varenummer 100 står to ganger i tilbudet: 10 stk à 50 og 10 stk à 70, til sammen 20 à 60
+OFFER = pd.DataFrame({
+    "Varenummer": [100, 200, 100],
+    "Beskrivelse_Tilbud": ["Rør", "Bend", "Rør"],
+    "Antall_Tilbud": [10.0, 5.0, 10.0],
+    "Enhet_Tilbud": ["stk", "stk", "stk"],
+    "Enhetspris_Tilbud": [50.0, 100.0, 70.0],
+    "Totalt pris": [500.0, 500.0, 700.0],
+})
+
+# Som fra tolkeren: vanlige tall som flyttall, kreditlinjer som tekst
+FIRST = pd.DataFrame({
+    "Varenummer": ["100", "200", "300"],
+    "Antall_Faktura": pd.Series([12.0, 6.0, 2.0], dtype="object"),
+    "Enhetspris_Faktura": [60.0, 100.0, 25.0],
+    "Rabatt": [0.0, 0.0, 0.0],
+    "Beløp_Faktura": pd.Series([720.0, 600.0, 50.0], dtype="object"),
+})
+SECOND = pd.DataFrame({
+    "Varenummer": ["100", "200"],
+    "Antall_Faktura": pd.Series([10.0, "-2"], dtype="object"),
+    "Enhetspris_Faktura": [66.0, 100.0],
+    "Rabatt": [0.0, 0.0],
+    "Beløp_Faktura": pd.Series([660.0, "-200,00"], dtype="object"),
+})
+
+
+def test_reconciliation_report():
+    totals = add_totals(None, aggregate_invoice(FIRST))
+    totals = add_totals(totals, aggregate_invoice(SECOND))
+
+    assert totals.loc["100"].to_dict() == {
+        "Fakturaer": 2, "Fakturert_Antall": 22, "Fakturert_Beløp": 1380, "Fakturert_Brutto": 1380,
+        "Laveste_Enhetspris": 60, "Høyeste_Enhetspris": 66, "Siste_Enhetspris": 66,
+    }
+    # Kreditlinjen trekker fra: 6 - 2 stk og 600 - 200 kr
+    assert totals.loc["200", ["Fakturaer", "Fakturert_Antall", "Fakturert_Beløp"]].tolist() == [2, 4, 400]
+
+    report = reconciliation_report(totals, OFFER).set_index("Varenummer")
+
+    rør = report.loc["100"]
+    assert (rør["Antall_Tilbud"], rør["Enhetspris_Tilbud"]) == (20, 60)
+    assert (rør["Gjenstående_Antall"], rør["Overfakturert_Antall"], rør["Overfakturert_Beløp"]) == (-2, 2, 180)
+    assert rør["Snittpris_Faktura"] == pytest.approx(1380 / 22)
+    assert rør["Prisavvik"] == pytest.approx(1380 / 22 - 60)
+    assert not rør["Kun_i_faktura"]
+
+    bend = report.loc["200"]
+    assert (bend["Gjenstående_Antall"], bend["Overfakturert_Antall"], bend["Overfakturert_Beløp"]) == (1, 0, 0)
+    assert bend["Prisavvik"] == 0
+
+    # Alt som er fakturert av en vare som ikke står i tilbudet, er overfakturert
+    ekstra = report.loc["300"]
+    assert ekstra["Kun_i_faktura"]
+    assert (ekstra["Overfakturert_Antall"], ekstra["Overfakturert_Beløp"]) == (2, 50)
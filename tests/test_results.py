@@ -0,0 +1,43 @@
+"""Resultatlageret skal holde filer og fakturanumre fra hverandre per tilbud."""
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from sjekkfaktura.results import DUPLICATE, OK, ResultStore  # noqa: E402
+
+
+def invoice(invoice_number):
+    data = pd.DataFrame({
+        "Varenummer": ["1012345"],
+        "Antall_Faktura": ["2"],
+        "Enhetspris_Faktura": ["245,50"],
+        "Rabatt": ["0,00"],
+        "Beløp_Faktura": ["491,00"],
+    })
+    result = {"header": {"Fakturanummer": invoice_number}, "feil": None, "data": data}
+    comparison = {"avvik": data.assign(Type="Antall"), "kun_i_faktura": data.iloc[:0]}
+    return result, comparison
+
+
+def test_same_file_for_two_offers(tmp_path):
+    store = ResultStore(str(tmp_path / "resultater.sqlite"))
+    result, comparison = invoice("90000101")
+
+    assert store.save_result("fil-a", "a.pdf", result, comparison, "tilbud-1") == OK
+    assert store.has_file("fil-a", "tilbud-1")
+    assert not store.has_file("fil-a", "tilbud-2")
+    assert store.find_invoice("90000101", "tilbud-2") is None
+
+    # Samme faktura mot et nytt tilbud er ikke et duplikat
+    assert store.save_result("fil-a", "a.pdf", result, comparison, "tilbud-2") == OK
+    assert store.list_invoices("tilbud-2")["status"].tolist() == [OK]
+    assert store.reconciliation_totals("tilbud-2").loc["1012345", "Fakturert_Antall"] == 2
+    assert len(store.load_deviations("tilbud-2", ["fil-a"])["avvik"]) == 1
+
+    # En annen fil med samme fakturanummer mot samme tilbud er det
+    assert store.save_result("fil-b", "b.pdf", result, comparison, "tilbud-2") == DUPLICATE
+
+    store.delete_invoice("fil-a", "tilbud-1")
+    assert store.list_invoices("tilbud-1").empty
+    assert len(store.load_deviations("tilbud-2", ["fil-a"])["avvik"]) == 1